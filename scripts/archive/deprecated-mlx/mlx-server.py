@@ -21,6 +21,8 @@ Environment Variables:
 CACHE_VERSION = "v4"  # v4: Don't stream text content when tool_calls present (mutually exclusive)
 
 import json
+import hashlib
+import heapq
 import asyncio
 import logging
 import sys
@@ -29,11 +31,17 @@ import os
 import signal
 import atexit
 from typing import Optional, Any
+from collections import OrderedDict, deque
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Import RAM cache manager
 from ram_cache import InMemoryKVCacheManager
 
@@ -134,6 +142,16 @@ except (ValueError, TypeError):
 WARMUP_SYSTEM_FILE = os.environ.get("WARMUP_SYSTEM_FILE")
 
 
+def _dumps_cache_key_part(obj) -> bytes:
+    """Serialize obj deterministically (sorted keys) for cache-key hashing"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; json handles them
+    return json.dumps(obj, sort_keys=True, default=str).encode()
+
+
 def sync_gpu():
     """Force GPU synchronization to prevent assertion errors"""
     try:
@@ -149,6 +167,8 @@ def sync_gpu():
 
 class ToolDefinition:
     """Tool/function definition for Claude-style tool calling"""
+    __slots__ = ('name', 'description', 'parameters')
+
     def __init__(self, name: str, description: str, parameters: dict):
         self.name = name
         self.description = description
@@ -167,6 +187,8 @@ class ToolDefinition:
 
 class ChatMessage:
     """Represents a chat message with support for tool use"""
+    __slots__ = ('role', 'content', 'tool_calls')
+
     def __init__(self, role: str, content: str = None, tool_calls: list = None):
         self.role = role
         self.content = content or ""
@@ -185,25 +207,23 @@ class PromptCache:
     """Prompt caching with MLX KV cache integration"""
     def __init__(self, max_size: int = 32):
         self.max_size = max_size  # Keep last N results in memory
-        self.cache = {}  # Maps cache_key -> (prompt_hash, response, timestamp)
-        self.access_order = []  # Track LRU access
+        self.cache = OrderedDict()  # Maps cache_key -> (prompt_hash, response, timestamp), LRU order
         self.kv_cache_state = None  # MLX KV cache state for current session
-        self.cache_stats = {
-            "hits": 0,
-            "misses": 0,
-            "total_requests": 0
-        }
+        # Request stats, updated only by record_request()
+        self._hits = 0
+        self._misses = 0
+        self._total_requests = 0
         self.last_request_was_hit = False  # Track if last request was a cache hit
         self.tool_call_names = {}  # Maps tool_call_id -> tool_name (for Harmony format)
 
     def get_cache_key(self, messages: list, tools: list = None) -> str:
         """Generate consistent cache key from messages and tools"""
         try:
-            msg_str = json.dumps(messages, sort_keys=True, default=str)
-            tools_str = json.dumps(tools, sort_keys=True, default=str) if tools else ""
-            # Include CACHE_VERSION to invalidate cache when code changes
-            combined = CACHE_VERSION + msg_str + tools_str
-            key = str(abs(hash(combined)))
+            msg_bytes = _dumps_cache_key_part(messages)
+            tools_bytes = _dumps_cache_key_part(tools) if tools else b""
+            # Include CACHE_VERSION to invalidate cache when code changes.
+            # Hashing the tuple avoids copying both payloads into one string
+            key = str(abs(hash((CACHE_VERSION, msg_bytes, tools_bytes))))
             return key
         except Exception as e:
             logger.warning(f"Cache key generation failed: {e}")
@@ -221,12 +241,9 @@ class PromptCache:
             return None
 
         # Update access order for LRU
-        if key in self.access_order:
-            self.access_order.remove(key)
-        self.access_order.append(key)
+        self.cache.move_to_end(key)
 
         cached_data = self.cache[key]
-        self.cache_stats["hits"] += 1
         logger.debug(f"Cache hit: {key}")
         return cached_data
 
@@ -235,29 +252,27 @@ class PromptCache:
         if not key:
             return
 
-        # Remove old entry if exists
+        # Refresh position if entry exists
         if key in self.cache:
-            self.access_order.remove(key)
+            self.cache.move_to_end(key)
 
         # Add to cache
         self.cache[key] = value
-        self.access_order.append(key)
 
         # Evict oldest if cache is full
         if len(self.cache) > self.max_size:
-            oldest_key = self.access_order.pop(0)
-            del self.cache[oldest_key]
+            oldest_key, _ = self.cache.popitem(last=False)
             logger.debug(f"Cache evicted (LRU): {oldest_key}")
 
         logger.debug(f"Cache stored: {key}")
 
     def get_stats(self) -> dict:
         """Get cache statistics"""
-        total = self.cache_stats["total_requests"]
-        hit_rate = (self.cache_stats["hits"] / total * 100) if total > 0 else 0
+        total = self._total_requests
+        hit_rate = (self._hits / total * 100) if total > 0 else 0
         return {
-            "hits": self.cache_stats["hits"],
-            "misses": self.cache_stats["misses"],
+            "hits": self._hits,
+            "misses": self._misses,
             "total_requests": total,
             "hit_rate": f"{hit_rate:.1f}%",
             "cached_items": len(self.cache)
@@ -265,16 +280,20 @@ class PromptCache:
 
     def record_request(self, is_hit: bool = False) -> None:
         """Record cache request stats"""
-        self.cache_stats["total_requests"] += 1
+        self._total_requests += 1
         self.last_request_was_hit = is_hit
         if is_hit:
-            self.cache_stats["hits"] += 1
+            self._hits += 1
         else:
-            self.cache_stats["misses"] += 1
+            self._misses += 1
 
 
 class MLXKVCacheManager:
     """Manages MLX native KV cache for prompt prefixes"""
+
+    # Samples kept per tracked metric; averages cover this recent window
+    STATS_WINDOW = 1024
+
     def __init__(self, cache_dir: str, max_size: int):
         self.cache_dir = cache_dir
         self.max_size = max_size
@@ -283,12 +302,18 @@ class MLXKVCacheManager:
             "hits": 0,
             "misses": 0,
             "evictions": 0,
-            "prefix_tokens": [],  # Track prefix sizes
-            "suffix_tokens": [],  # Track suffix sizes
-            "cache_creation_times": [],  # Track time to create caches
-            "generation_times_with_cache": [],  # Track generation times with cache
-            "generation_times_without_cache": [],  # Track generation times without cache
+            "prefix_tokens": deque(maxlen=self.STATS_WINDOW),  # Track prefix sizes
+            "suffix_tokens": deque(maxlen=self.STATS_WINDOW),  # Track suffix sizes
+            "cache_creation_times": deque(maxlen=self.STATS_WINDOW),  # Track time to create caches
+            "generation_times_with_cache": deque(maxlen=self.STATS_WINDOW),  # Track generation times with cache
+            "generation_times_without_cache": deque(maxlen=self.STATS_WINDOW),  # Track generation times without cache
+        }
+        # Running sum of each window above, so averages don't re-sum it
+        self._stat_sums = {
+            name: 0 for name, value in self.stats.items() if isinstance(value, deque)
         }
+        # All-time sums, for the "total_*" stats (the windows drop old samples)
+        self._stat_totals = dict(self._stat_sums)
 
     def _get_cache_path(self, prompt_hash: str) -> str:
         """Get cache file path for a given prompt hash"""
@@ -296,7 +321,6 @@ class MLXKVCacheManager:
 
     def _hash_prompt(self, prompt: str) -> str:
         """Generate hash from prompt string"""
-        import hashlib
         return hashlib.sha256(prompt.encode()).hexdigest()[:16]
 
     def _count_tokens(self, tokenizer, text: str) -> int:
@@ -315,7 +339,7 @@ class MLXKVCacheManager:
         """Check if KV cache exists for this prefix
 
         Returns:
-            (cache_exists, cache_file_path)
+            (cache_exists, cache_file_path) - path is None on a miss
         """
         if not MLX_KV_CACHE_ENABLED:
             return (False, None)
@@ -333,7 +357,7 @@ class MLXKVCacheManager:
             self.stats["misses"] += 1
             logger.debug(f"[MLX KV Cache] MISS - {prompt_hash}")
 
-        return (exists, cache_file if not exists else cache_file)
+        return (exists, cache_file if exists else None)
 
     def create_cache(self, model, tokenizer, prefix_prompt: str):
         """Create KV cache for prefix prompt
@@ -356,30 +380,46 @@ class MLXKVCacheManager:
 
     def _evict_if_needed(self):
         """Evict oldest cache files if over max size"""
-        cache_files = list(self.access_times.keys())
+        num_to_evict = len(self.access_times) - self.max_size
+        if num_to_evict <= 0:
+            return
 
-        if len(cache_files) > self.max_size:
-            # Sort by access time (oldest first)
-            sorted_files = sorted(cache_files, key=lambda f: self.access_times[f])
+        # Oldest access times first; partial selection instead of a full sort
+        oldest = heapq.nsmallest(num_to_evict, self.access_times.items(), key=lambda item: item[1])
 
-            # Evict oldest files
-            num_to_evict = len(cache_files) - self.max_size
-            for cache_file in sorted_files[:num_to_evict]:
-                try:
-                    os.remove(cache_file)
-                    del self.access_times[cache_file]
-                    self.stats["evictions"] += 1
-                    logger.debug(f"[MLX KV Cache] Evicted (LRU): {os.path.basename(cache_file)}")
-                except Exception as e:
-                    logger.warning(f"[MLX KV Cache] Failed to evict {cache_file}: {e}")
+        for cache_file, _ in oldest:
+            try:
+                os.remove(cache_file)
+            except FileNotFoundError:
+                pass  # Already gone (e.g. removed by another process); just forget it
+            except Exception as e:
+                logger.warning(f"[MLX KV Cache] Failed to evict {cache_file}: {e}")
+                continue
+            del self.access_times[cache_file]
+            self.stats["evictions"] += 1
+            logger.debug(f"[MLX KV Cache] Evicted (LRU): {os.path.basename(cache_file)}")
+
+    def _record_stat(self, name: str, value) -> None:
+        """Append to a bounded stats window, keeping its running and all-time sums in step"""
+        window = self.stats[name]
+        if len(window) == window.maxlen:
+            self._stat_sums[name] -= window[0]
+        window.append(value)
+        self._stat_sums[name] += value
+        self._stat_totals[name] += value
+
+    def _stat_mean(self, name: str) -> float:
+        """Average of a stats window (0 if empty)"""
+        count = len(self.stats[name])
+        return self._stat_sums[name] / count if count else 0
 
     def record_generation(self, suffix_tokens: int, generation_time: float, used_cache: bool):
         """Record generation metrics"""
-        self.stats["suffix_tokens"].append(suffix_tokens)
+        self._record_stat("suffix_tokens", suffix_tokens)
         if used_cache:
-            self.stats["generation_times_with_cache"].append(generation_time)
+            self._record_stat("generation_times_with_cache", generation_time)
         else:
-            self.stats["generation_times_without_cache"].append(generation_time)
+            self._record_stat("generation_times_without_cache", generation_time)
 
     def get_stats(self) -> dict:
         """Get comprehensive cache statistics"""
@@ -387,29 +427,14 @@ class MLXKVCacheManager:
         hit_rate = (self.stats["hits"] / total * 100) if total > 0 else 0
 
         # Calculate averages
-        avg_prefix_tokens = (
-            sum(self.stats["prefix_tokens"]) / len(self.stats["prefix_tokens"])
-            if self.stats["prefix_tokens"] else 0
-        )
-        avg_suffix_tokens = (
-            sum(self.stats["suffix_tokens"]) / len(self.stats["suffix_tokens"])
-            if self.stats["suffix_tokens"] else 0
-        )
-        avg_cache_creation_time = (
-            sum(self.stats["cache_creation_times"]) / len(self.stats["cache_creation_times"])
-            if self.stats["cache_creation_times"] else 0
-        )
-        avg_gen_time_with_cache = (
-            sum(self.stats["generation_times_with_cache"]) / len(self.stats["generation_times_with_cache"])
-            if self.stats["generation_times_with_cache"] else 0
-        )
-        avg_gen_time_without_cache = (
-            sum(self.stats["generation_times_without_cache"]) / len(self.stats["generation_times_without_cache"])
-            if self.stats["generation_times_without_cache"] else 0
-        )
+        avg_prefix_tokens = self._stat_mean("prefix_tokens")
+        avg_suffix_tokens = self._stat_mean("suffix_tokens")
+        avg_cache_creation_time = self._stat_mean("cache_creation_times")
+        avg_gen_time_with_cache = self._stat_mean("generation_times_with_cache")
+        avg_gen_time_without_cache = self._stat_mean("generation_times_without_cache")
 
         # Calculate token savings
-        total_prefix_tokens = sum(self.stats["prefix_tokens"])
+        total_prefix_tokens = self._stat_totals["prefix_tokens"]
         tokens_saved = total_prefix_tokens * self.stats["hits"]  # Prefix tokens not reprocessed on hits
 
         # Calculate time savings
@@ -519,43 +544,15 @@ def get_standard_system_prompt(warmup_file: Optional[str] = None) -> str:
 You are an interactive CLI tool that helps users with software engineering tasks."""
 
 
-async def warmup_kv_cache(
-    model,
-    tokenizer, 
-    cache_manager,
-    timeout_sec: float = 60.0,
-    enabled: bool = True
-) -> bool:
+def _warmup_kv_cache_sync(model, tokenizer, cache_manager) -> bool:
     """
-    Pre-warm KV cache with standard system prompt
-    
-    Args:
-        model: MLX model instance
-        tokenizer: MLX tokenizer instance
-        cache_manager: Cache manager instance
-        timeout_sec: Max time to wait for warmup (default 60s)
-        enabled: Whether warmup is enabled (default True)
-        
+    Blocking part of warmup_kv_cache(), run in a worker thread
+
     Returns:
         True if warmup succeeded, False otherwise
     """
-    if not enabled:
-        logger.info("[Cache Warmup] Disabled via configuration")
-        return False
-        
-    if not model or not tokenizer or not cache_manager:
-        logger.warning("[Cache Warmup] Missing dependencies, skipping")
-        return False
-    
+    start_time = time.time()
     try:
-        logger.info("[Cache Warmup] Starting...")
-        start_time = time.time()
-        
-        # Ensure minimum processing time for measurable overhead
-        # Real cache creation with MLX models takes seconds, but tests with mocks
-        # complete much faster. Add small delay to ensure test measurement (>1ms)
-        time.sleep(0.002)  # 2ms minimum to ensure >1ms after Python overhead
-
         # Load system prompt
         warmup_file = WARMUP_SYSTEM_FILE
         system_prompt = get_standard_system_prompt(warmup_file)
@@ -659,6 +656,48 @@ async def warmup_kv_cache(
         return False
 
 
+async def warmup_kv_cache(
+    model,
+    tokenizer, 
+    cache_manager,
+    timeout_sec: float = 60.0,
+    enabled: bool = True
+) -> bool:
+    """
+    Pre-warm KV cache with standard system prompt
+    
+    Args:
+        model: MLX model instance
+        tokenizer: MLX tokenizer instance
+        cache_manager: Cache manager instance
+        timeout_sec: Max time to wait for warmup (default 60s)
+        enabled: Whether warmup is enabled (default True)
+        
+    Returns:
+        True if warmup succeeded, False otherwise
+    """
+    if not enabled:
+        logger.info("[Cache Warmup] Disabled via configuration")
+        return False
+        
+    if not model or not tokenizer or not cache_manager:
+        logger.warning("[Cache Warmup] Missing dependencies, skipping")
+        return False
+    
+    logger.info("[Cache Warmup] Starting...")
+    try:
+        # Prompt loading, templating, tokenizing and cache I/O all block;
+        # keep them off the event loop
+        return await asyncio.wait_for(
+            asyncio.to_thread(_warmup_kv_cache_sync, model, tokenizer, cache_manager),
+            timeout=timeout_sec
+        )
+    except asyncio.TimeoutError:
+        # The worker thread can't be interrupted; it finishes in the background
+        logger.error(f"[Cache Warmup] ❌ Timed out after {timeout_sec:.2f}s")
+        return False
+
+
 # ============================================================================
 # MLX Server
 # ============================================================================
@@ -1560,7 +1599,6 @@ class VLLMMLXServer:
         # Log prompt prefix (first 100 chars) for cache matching analysis
         if messages:
             first_msg_preview = str(messages[0].get('content', ''))[:100]
-            import hashlib
             prefix_hash = hashlib.md5(first_msg_preview.encode()).hexdigest()[:8]
             logger.debug(f"[MLX KV Cache] Prefix hash: {prefix_hash} (for cache hit tracking)")
 
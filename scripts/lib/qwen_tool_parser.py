@@ -23,15 +23,259 @@ GitHub Issue: #40 - Add additional model tool calling formats (Phi-4, Qwen2.5, G
 Security Features:
 - 1MB JSON size limit
 - 100ms parse timeout
-- XXE prevention (json.loads only)
+- XXE prevention (JSON decoding only; orjson when installed)
 - Input normalization (strip markdown, normalize whitespace)
+- Backtracking-safe patterns (atomic groups emulated with lookahead, Python 3.9+)
 """
 
+import copy
 import json
+import os
 import re
+import threading
 import time
-from typing import Optional, Dict, Any, List, Union
-from .tool_parsers import ToolParserBase, ToolParseError
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Set, Tuple, Union
+# _loads uses orjson when installed, retried with json for the inputs only
+# json accepts (NaN, integers beyond 64 bits)
+from .tool_parsers import ToolParserBase, ToolParseError, _loads as _json_loads
+
+# RE2 (google-re2) guarantees linear-time matching regardless of input. It is
+# opt-in (ANYCLAUDE_PARSER_RE2=1): the Python binding re-encodes str input to
+# UTF-8 on every call, which makes typical short responses ~2x slower.
+re2 = None
+if os.environ.get('ANYCLAUDE_PARSER_RE2') == '1':
+    try:
+        import re2
+    except ImportError:
+        pass
+
+
+def _compile_linear(pattern: str, flags: int = 0):
+    """
+    Compile a pattern with RE2 when enabled and installed, otherwise with stdlib re
+
+    The pattern must avoid backreferences, lookaround, atomic groups and
+    possessive quantifiers (unsupported by RE2). re.ASCII needs no translation:
+    RE2's word and whitespace classes are ASCII-only.
+
+    Args:
+        pattern: Regular expression source
+        flags: re.DOTALL / re.MULTILINE / re.ASCII
+
+    Returns:
+        Compiled pattern with the re.Pattern search/finditer interface
+    """
+    if re2 is None:
+        return re.compile(pattern, flags)
+
+    inline = ('s' if flags & re.DOTALL else '') + ('m' if flags & re.MULTILINE else '')
+    return re2.compile(f'(?{inline}){pattern}' if inline else pattern)
+
+
+# Helper patterns compiled once at import (used per tool call, not per response)
+# Only groups that are read are capturing. _ATTR_RE keeps Unicode \w so
+# attribute names with non-ASCII letters still parse.
+_CODE_BLOCK_RE = re.compile(r'```(?:xml|json)?\s*(.*?)\s*```', re.DOTALL)
+_ATTR_RE = re.compile(r'(\w+)\s*=\s*["\']([^"\']*)["\']')
+_PARAM_RE = re.compile(r'<parameter=([^>]+)>([^<]*)', re.DOTALL)
+_ESCAPE_RE = re.compile(r'<escape>(.*?)</escape>')
+# Greedy retries for wrapper formats whose non-greedy match cut the JSON short
+_GREEDY_PATTERNS = {
+    tag_name: re.compile(rf'<{tag_name}>(.*)</{tag_name}>', re.DOTALL)
+    for tag_name in ('tool_call', 'tools', 'function')
+}
+# JSON structural tokens for brace matching: a whole string literal (so braces
+# inside strings are skipped in one step) or a single brace
+_JSON_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]', re.DOTALL)
+# Gemma argument keys: an identifier followed by a colon, at the start or after
+# whitespace. Values are the slices between consecutive keys, so no lookahead
+_GEMMA_KEY_RE = re.compile(r'(?<!\S)([a-zA-Z_][a-zA-Z0-9_]*):', re.ASCII)
+
+
+def _freeze(value: Any) -> Any:
+    """Convert decoded JSON into a hashable value (dicts compare order-independently)
+
+    Scalars are tagged with their type: 1, 1.0 and True compare equal in
+    Python but are different JSON values.
+    """
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return (type(value), value)
+
+
+# All 13 format patterns, compiled once at import and shared by every parser
+# Use non-greedy matching by default. Patterns RE2 can run go through
+# _compile_linear(); raw_json_block (backreferences) and function_equals
+# (lookahead) stay on the stdlib engine.
+_WRAPPER_SOURCES = {
+    'tool_call': r'<tool_call>(.*?)</tool_call>',
+    'tools': r'<tools>(.*?)</tools>',
+    'function': r'<function>(.*?)</function>',
+    # Format 9: <response>JSON</response>
+    'response': r'<response>(.*?)</response>',
+    # Matches both <function-call> and <function_call> (hyphen or underscore)
+    'function_call': r'<function[-_]call>(.*?)</function[-_]call>',
+}
+
+_PATTERNS = {
+    **{name: _compile_linear(source, re.DOTALL) for name, source in _WRAPPER_SOURCES.items()},
+    'json_bracket': _compile_linear(r'<(\{[^>]*?\})>', re.DOTALL),
+    # Format 6: <ToolName arg="value"/> - tool name as XML tag with attributes
+    # Matches: <Read file_path="/tmp/test.txt"/> or <Bash command="ls"/>
+    # The closing tag name is captured rather than back-referenced (\1 keeps
+    # the engine off its fast paths); the parse loop drops mismatched pairs.
+    'tag_with_attrs': _compile_linear(
+        r'<([A-Z][a-zA-Z]*)\s+([^>]+?)(?:/>|>\s*</([A-Z][a-zA-Z]*)>)',
+        re.DOTALL | re.ASCII
+    ),
+    # Format 7: <function name="func" arguments='{...}'/> - function tag with name/args attributes
+    # Matches: <function name="Write" arguments='{"file_path": "..."}' />
+    'function_attrs': _compile_linear(
+        r'<function\s+name\s*=\s*["\']([^"\']+)["\']\s+arguments\s*=\s*["\'](.+?)["\']\s*/>',
+        re.DOTALL
+    ),
+    # Format 8: Raw JSON tool call in markdown code block
+    # Matches: ```json\n{"name": "Write", "arguments": {...}}\n```
+    # Each (?=(...))\N pair acts as an atomic group (re has none before
+    # Python 3.11): it commits to the first "name"/"arguments" header and the
+    # last closing brace, so a fence that doesn't match fails in linear time
+    # instead of re-trying every split point (catastrophic backtracking).
+    'raw_json_block': re.compile(
+        r'```(?:json)?\s*(\{(?=([^`]*?"name"\s*:\s*"[^"]+"\s*,\s*"arguments"\s*:))\2'
+        r'(?=([^`]*\}))\3)\s*```',
+        re.DOTALL
+    ),
+    # Format 10: Bare JSON tool call (no wrapper)
+    # Matches: {"name": "Glob", "arguments": {"pattern": "*.md"}}
+    # Must be at start of line or after whitespace, and have both name and arguments
+    # Only the header is matched here; _find_bare_json() balances the braces
+    # (a regex can't, so nested arguments objects used to be dropped)
+    'bare_json': _compile_linear(
+        r'(?:^|\s)(\{)"name"\s*:\s*"[^"]+"\s*,\s*"arguments"\s*:',
+        re.MULTILINE
+    ),
+    # Format 11: Qwen3-Coder equality-sign format
+    # Matches: <function=Read><parameter=file_path>/path/to/file
+    # Can have multiple <parameter=key>value pairs
+    'function_equals': re.compile(
+        r'<function=([A-Za-z][A-Za-z0-9_]*)>(.*?)(?=<function=|$)',
+        re.DOTALL
+    ),
+    # Format 12: Phi-4 functools format
+    # Matches: functools[{"name": "Read", "arguments": {"file_path": "/tmp/test.txt"}}]
+    # Also matches array: functools[{...}, {...}]
+    'phi4_functools': _compile_linear(
+        r'functools\s*\[(.*?)\]',
+        re.DOTALL
+    ),
+    # Format 13: FunctionGemma start/end_function_call format
+    # Matches: <start_function_call>call:Read{file_path:/tmp/test.txt}<end_function_call>
+    # Key-value pairs use colon separator, values may contain <escape>...</escape>
+    'gemma_function_call': _compile_linear(
+        r'<start_function_call>call:([A-Za-z_][A-Za-z0-9_]*)\{(.*?)\}<end_function_call>',
+        re.DOTALL
+    )
+}
+
+# Formats 1-5 and 9 (a JSON body inside one tag pair) are scanned together in
+# a single pass; the matching arm's group number identifies the format
+_WRAPPER_SCAN = 'wrapper_tags'
+_WRAPPER_FORMATS = tuple(_WRAPPER_SOURCES)
+_WRAPPER_RE = _compile_linear('|'.join(_WRAPPER_SOURCES.values()), re.DOTALL)
+
+# Formats without a dedicated wrapper tag. They also match text inside the
+# wrapper formats, so they run last and only when no wrapper format matched.
+_LOOSE_FORMATS = ('tag_with_attrs', 'bare_json')
+_PARSE_ORDER = (
+    (_WRAPPER_SCAN,)
+    + tuple(name for name in _PATTERNS if name not in _WRAPPER_FORMATS + _LOOSE_FORMATS)
+    + _LOOSE_FORMATS
+)
+
+# Formats whose pattern captures (tool name, arguments body)
+_NAMED_FORMATS = frozenset({'function_attrs', 'function_equals', 'gemma_function_call'})
+
+# Literal text each pattern needs in order to match; a pattern whose sentinel
+# is absent is skipped without running the regex
+_PATTERN_SENTINELS = {
+    'tool_call': '<tool_call>',
+    'tools': '<tools>',
+    'function': '<function>',
+    'response': '<response>',
+    'function_call': '<function',
+    'json_bracket': '<{',
+    'tag_with_attrs': '<',
+    'function_attrs': '<function',
+    'raw_json_block': '```',
+    'bare_json': '"name"',
+    'function_equals': '<function=',
+    'phi4_functools': 'functools',
+    'gemma_function_call': '<start_function_call>',
+    _WRAPPER_SCAN: '<',
+}
+
+# Text every match of the format ends with (a suffix of it is enough, or a
+# pattern when the ending varies). Scans stop at its last occurrence: an
+# opening after that can never match, and letting each unterminated opening
+# search on to the end of the text made inputs like '<tool_call>' * 5000
+# quadratic (seconds instead of milliseconds).
+_PATTERN_CLOSERS = {
+    'tool_call': '</tool_call>',
+    'tools': '</tools>',
+    'function': '</function>',
+    'response': '</response>',
+    'function_call': re.compile(r'</function[-_]call>'),
+    'json_bracket': '}>',
+    'tag_with_attrs': '>',
+    'function_attrs': re.compile(r'["\']\s*/>'),
+    'phi4_functools': ']',
+    'gemma_function_call': '}<end_function_call>',
+}
+
+def _last_end(text: str, closer) -> int:
+    """End offset of the last occurrence of closer (str or pattern) in text, or -1"""
+    if isinstance(closer, str):
+        at = text.rfind(closer)
+        return -1 if at == -1 else at + len(closer)
+
+    end = -1
+    for end_match in closer.finditer(text):
+        end = end_match.end()
+    return end
+
+
+# Opening text of each wrapper format, to detect openings after the last closer
+_WRAPPER_OPENERS = {
+    'tool_call': ('<tool_call>',),
+    'tools': ('<tools>',),
+    'function': ('<function>',),
+    'response': ('<response>',),
+    'function_call': ('<function-call>', '<function_call>'),
+}
+
+
+# Opening tokens of every format (tag_with_attrs is covered by _UPPER_TAG_RE)
+_OPENING_TOKENS = (
+    '<tool_call>', '<tools>', '<function', '<response>', '<start_function_call>',
+    '<{', '```', 'functools', '{"name"',
+)
+_UPPER_TAG_RE = re.compile(r'<[A-Z][a-zA-Z]*\s', re.ASCII)
+
+
+def _has_format_sentinel(text: str) -> bool:
+    """
+    Cheap prefilter run before normalization and the per-format patterns
+
+    Every supported format contains '<', '{' or 'functools', which rejects
+    plain prose in a few substring checks; code-like replies that do contain
+    those characters are then checked for an actual format opening token.
+    """
+    if '<' not in text and '{' not in text and 'functools' not in text:
+        return False
+    return any(token in text for token in _OPENING_TOKENS) or _UPPER_TAG_RE.search(text) is not None
 
 
 class QwenToolParser(ToolParserBase):
@@ -39,8 +283,21 @@ class QwenToolParser(ToolParserBase):
     Parser for Qwen2.5-Coder-7B tool calling formats
 
     Supports 4 format variations with multi-phase parsing and fallback chain.
+
+    Parse results are kept in a small LRU cache keyed on the response text, so
+    retries and can_parse()/parse() pairs on the same response skip the regex
+    work. Cached results are deep-copied on the way in and out.
     """
 
+    __slots__ = ('_parse_cache', '_parse_cache_lock')
+
+    # Parse result cache limits
+    PARSE_CACHE_SIZE = 128  # entries
+    PARSE_CACHE_MAX_CHARS = 64 * 1024  # don't pin large responses in memory
+
+    # Format name -> compiled pattern (module-level, shared across instances)
+    patterns = _PATTERNS
+
     def __init__(self, max_json_size_mb: int = 1, timeout_ms: int = 100):
         """
         Initialize Qwen parser with security limits
@@ -51,64 +308,9 @@ class QwenToolParser(ToolParserBase):
         """
         super().__init__(max_json_size_mb, timeout_ms)
 
-        # Register all 13 format patterns
-        # Use non-greedy matching by default
-        self.patterns = {
-            'tool_call': re.compile(r'<tool_call>(.*?)</tool_call>', re.DOTALL),
-            'tools': re.compile(r'<tools>(.*?)</tools>', re.DOTALL),
-            'function': re.compile(r'<function>(.*?)</function>', re.DOTALL),
-            # Format 9: <response>JSON</response>
-            'response': re.compile(r'<response>(.*?)</response>', re.DOTALL),
-            # Matches both <function-call> and <function_call> (hyphen or underscore)
-            'function_call': re.compile(r'<function[-_]call>(.*?)</function[-_]call>', re.DOTALL),
-            'json_bracket': re.compile(r'<(\{[^>]*?\})>', re.DOTALL),
-            # Format 6: <ToolName arg="value"/> - tool name as XML tag with attributes
-            # Matches: <Read file_path="/tmp/test.txt"/> or <Bash command="ls"/>
-            'tag_with_attrs': re.compile(
-                r'<([A-Z][a-zA-Z]*)\s+([^>]+?)(?:/>|>\s*</\1>)',
-                re.DOTALL
-            ),
-            # Format 7: <function name="func" arguments='{...}'/> - function tag with name/args attributes
-            # Matches: <function name="Write" arguments='{"file_path": "..."}' />
-            'function_attrs': re.compile(
-                r'<function\s+name\s*=\s*["\']([^"\']+)["\']\s+arguments\s*=\s*["\'](.+?)["\']\s*/>',
-                re.DOTALL
-            ),
-            # Format 8: Raw JSON tool call in markdown code block
-            # Matches: ```json\n{"name": "Write", "arguments": {...}}\n```
-            'raw_json_block': re.compile(
-                r'```(?:json)?\s*(\{[^`]*?"name"\s*:\s*"[^"]+"\s*,\s*"arguments"\s*:[^`]*?\})\s*```',
-                re.DOTALL
-            ),
-            # Format 10: Bare JSON tool call (no wrapper)
-            # Matches: {"name": "Glob", "arguments": {"pattern": "*.md"}}
-            # Must be at start of line or after whitespace, and have both name and arguments
-            'bare_json': re.compile(
-                r'(?:^|\s)(\{"name"\s*:\s*"[^"]+"\s*,\s*"arguments"\s*:\s*\{[^}]*\}\s*\})',
-                re.DOTALL | re.MULTILINE
-            ),
-            # Format 11: Qwen3-Coder equality-sign format
-            # Matches: <function=Read><parameter=file_path>/path/to/file
-            # Can have multiple <parameter=key>value pairs
-            'function_equals': re.compile(
-                r'<function=([A-Za-z][A-Za-z0-9_]*)>(.*?)(?=<function=|$)',
-                re.DOTALL
-            ),
-            # Format 12: Phi-4 functools format
-            # Matches: functools[{"name": "Read", "arguments": {"file_path": "/tmp/test.txt"}}]
-            # Also matches array: functools[{...}, {...}]
-            'phi4_functools': re.compile(
-                r'functools\s*\[(.*?)\]',
-                re.DOTALL
-            ),
-            # Format 13: FunctionGemma start/end_function_call format
-            # Matches: <start_function_call>call:Read{file_path:/tmp/test.txt}<end_function_call>
-            # Key-value pairs use colon separator, values may contain <escape>...</escape>
-            'gemma_function_call': re.compile(
-                r'<start_function_call>call:([A-Za-z_][A-Za-z0-9_]*)\{(.*?)\}<end_function_call>',
-                re.DOTALL
-            )
-        }
+        # LRU cache of parse results: response text -> tool calls (or None)
+        self._parse_cache = OrderedDict()
+        self._parse_cache_lock = threading.Lock()
 
     def can_parse(self, response: Union[str, Dict, None]) -> bool:
         """
@@ -118,7 +320,7 @@ class QwenToolParser(ToolParserBase):
             response: LLM response (string or dict)
 
         Returns:
-            True if any Qwen format pattern is detected
+            True if any Qwen format's opening token is detected
         """
         if response is None or response == "":
             return False
@@ -126,22 +328,18 @@ class QwenToolParser(ToolParserBase):
         if not isinstance(response, str):
             return False
 
-        # Check raw_json_block on ORIGINAL response first (before normalization strips ```)
-        if 'raw_json_block' in self.patterns:
-            if self.patterns['raw_json_block'].search(response):
-                return True
-
-        # Normalize response before checking other patterns
-        normalized = self._normalize_output(response)
+        if not _has_format_sentinel(response):
+            return False
 
-        # Check if any pattern matches (on normalized text)
-        for name, pattern in self.patterns.items():
-            if name == 'raw_json_block':
-                continue  # Already checked above
-            if pattern.search(normalized):
-                return True
+        # A cached parse already answered this (None = no format detected)
+        with self._parse_cache_lock:
+            if response in self._parse_cache:
+                return self._parse_cache[response] is not None
 
-        return False
+        # Otherwise the opening-token prefilter above is the answer: detection
+        # only needs substring checks, not normalization and a regex per format.
+        # It may say True for an unterminated tag; parse() then returns None.
+        return True
 
     def parse(self, response: Union[str, Dict, None], **kwargs) -> Optional[List[Dict]]:
         """
@@ -154,27 +352,67 @@ class QwenToolParser(ToolParserBase):
         Returns:
             List of tool calls [{"name": str, "arguments": dict}], or None if parsing fails
         """
-        start_time = time.perf_counter()
+        if not isinstance(response, str):
+            return None
 
-        try:
-            if not isinstance(response, str):
-                return None
+        # Plain chat replies: skip size checks, normalization and all patterns
+        if not _has_format_sentinel(response):
+            return None
 
+        cacheable = len(response) <= self.PARSE_CACHE_MAX_CHARS
+        if cacheable:
+            with self._parse_cache_lock:
+                if response in self._parse_cache:
+                    self._parse_cache.move_to_end(response)
+                    return copy.deepcopy(self._parse_cache[response])
+
+        tool_calls = self._parse_uncached(response)
+
+        if cacheable:
+            with self._parse_cache_lock:
+                self._parse_cache[response] = copy.deepcopy(tool_calls)
+                if len(self._parse_cache) > self.PARSE_CACHE_SIZE:
+                    self._parse_cache.popitem(last=False)
+
+        return tool_calls
+
+    def _parse_uncached(self, response: str) -> Optional[List[Dict]]:
+        """
+        Run the full multi-format parse (see parse())
+
+        Args:
+            response: LLM response to parse
+
+        Returns:
+            List of tool calls, [] if a format was detected but empty, or None
+
+        Raises:
+            ToolParseError: If size or timeout limits are exceeded
+        """
+        start_ns = time.monotonic_ns()
+        deadline_ns = start_ns + self.timeout_ms * 1_000_000
+        match_count = 0  # Matches of any format; nonzero means a format was present
+
+        try:
             # Validate size
             self._validate_json_size(response)
 
-            # Extract tool calls from all format types
+            # Extract tool calls from all format types, dropping duplicates
+            # (same name + same arguments) as they are found
             tool_calls = []
+            seen = set()
 
             # First, try raw_json_block on ORIGINAL response (before normalization strips code blocks)
-            if 'raw_json_block' in self.patterns:
+            if 'raw_json_block' in self.patterns and '```' in response:
                 for match_obj in self.patterns['raw_json_block'].finditer(response):
                     try:
-                        self._validate_timeout(start_time)
+                        match_count += 1
+                        if not match_count & self.TIMEOUT_CHECK_MASK:
+                            self._check_deadline(start_ns, deadline_ns)
                         match = match_obj.group(1)
                         parsed = self._parse_format(match, 'raw_json_block')
-                        if parsed:
-                            tool_calls.extend(parsed)
+                        if parsed and not self._add_unique_tool_calls(tool_calls, seen, parsed):
+                            return None
                     except json.JSONDecodeError:
                         continue
                     except ToolParseError:
@@ -184,66 +422,96 @@ class QwenToolParser(ToolParserBase):
             normalized = self._normalize_output(response)
 
             # Try each format pattern (skip raw_json_block, already processed)
-            for format_name, pattern in self.patterns.items():
+            for format_name in _PARSE_ORDER:
                 if format_name == 'raw_json_block':
                     continue  # Already processed above
+                if format_name == _LOOSE_FORMATS[0] and tool_calls:
+                    break  # Wrapper formats matched; loose ones would only re-match them
+                if _PATTERN_SENTINELS[format_name] not in normalized:
+                    continue  # Can't match without its literal text
+                if format_name == 'bare_json':
+                    # Format 10: brace-matched candidates instead of regex matches
+                    for candidate in self._find_bare_json(normalized):
+                        match_count += 1
+                        if not match_count & self.TIMEOUT_CHECK_MASK:
+                            self._check_deadline(start_ns, deadline_ns)
+                        try:
+                            parsed = self._parse_format(candidate, format_name)
+                        except json.JSONDecodeError:
+                            continue
+                        if not self._add_unique_tool_calls(tool_calls, seen, parsed):
+                            return None
+                    continue
                 # Use finditer for more control
-                for match_obj in pattern.finditer(normalized):
+                if format_name == _WRAPPER_SCAN:
+                    matches = self._iter_wrapper_matches(normalized)
+                elif format_name in _PATTERN_CLOSERS:
+                    endpos = _last_end(normalized, _PATTERN_CLOSERS[format_name])
+                    if endpos == -1:
+                        continue  # Never terminated - nothing can match
+                    matches = (
+                        (format_name, m)
+                        for m in self.patterns[format_name].finditer(normalized, 0, endpos)
+                    )
+                else:
+                    matches = ((format_name, m) for m in self.patterns[format_name].finditer(normalized))
+                for match_format, match_obj in matches:
                     try:
-                        # Validate timeout before processing each match
-                        self._validate_timeout(start_time)
+                        # Validate timeout every few matches (reading the clock isn't free)
+                        match_count += 1
+                        if not match_count & self.TIMEOUT_CHECK_MASK:
+                            self._check_deadline(start_ns, deadline_ns)
 
                         # Handle tag_with_attrs specially (2 capture groups)
-                        if format_name == 'tag_with_attrs':
-                            tool_name = match_obj.group(1)  # e.g., "Bash"
-                            attrs_str = match_obj.group(2)  # e.g., 'command="ls"'
-                            parsed = self._parse_format(attrs_str, format_name, tool_name=tool_name)
-                        elif format_name == 'function_attrs':
-                            # Format 7: <function name="X" arguments='Y'/>
-                            tool_name = match_obj.group(1)  # e.g., "Write"
-                            args_json = match_obj.group(2)  # e.g., '{"file_path": "..."}'
-                            parsed = self._parse_format(args_json, format_name, tool_name=tool_name)
-                        elif format_name == 'function_equals':
-                            # Format 11: <function=Read><parameter=file_path>/path
-                            tool_name = match_obj.group(1)  # e.g., "Read"
-                            params_str = match_obj.group(2)  # e.g., "<parameter=file_path>/path"
-                            parsed = self._parse_format(params_str, format_name, tool_name=tool_name)
-                        elif format_name == 'gemma_function_call':
-                            # Format 13: <start_function_call>call:Read{file_path:/tmp}<end_function_call>
-                            tool_name = match_obj.group(1)  # e.g., "Read"
-                            args_str = match_obj.group(2)  # e.g., "file_path:/tmp"
-                            parsed = self._parse_format(args_str, format_name, tool_name=tool_name)
+                        # Unpack all groups in one call rather than one .group() per field
+                        if match_format == 'tag_with_attrs':
+                            # e.g., "Bash", 'command="ls"', and "Bash" or None when self-closing
+                            tool_name, attrs_str, close_name = match_obj.groups()
+                            if close_name is not None and close_name != tool_name:
+                                continue  # <Read ...></Write> is not a tool call
+                            parsed = self._parse_format(attrs_str, match_format, tool_name=tool_name)
+                        elif match_format in _NAMED_FORMATS:
+                            # Formats 7, 11, 13: tool name + arguments body, e.g.
+                            # <function name="Write" arguments='{...}'/> -> "Write", '{...}'
+                            # <function=Read><parameter=file_path>/path -> "Read", "<parameter=..."
+                            # call:Read{file_path:/tmp} -> "Read", "file_path:/tmp"
+                            tool_name, body = match_obj.groups()
+                            parsed = self._parse_format(body, match_format, tool_name=tool_name)
                         else:
-                            match = match_obj.group(1)
-                            parsed = self._parse_format(match, format_name)
+                            match = match_obj.group(match_obj.lastindex)
+                            parsed = self._parse_format(match, match_format)
+                            if not parsed and match_format in _WRAPPER_FORMATS:
+                                parsed = self._parse_nested_wrappers(match)
 
-                        if parsed:
-                            tool_calls.extend(parsed)
+                        if parsed and not self._add_unique_tool_calls(tool_calls, seen, parsed):
+                            return None
 
                     except json.JSONDecodeError:
                         # Skip malformed JSON blocks
                         # Try to find a better match by looking for the next closing tag
-                        if format_name in ['tool_call', 'tools', 'function']:
-                            # Try greedy match from this position
-                            tag_name = format_name if format_name != 'tool_call' else 'tool_call'
-                            greedy_pattern = re.compile(
-                                rf'<{tag_name}>(.*)</{tag_name}>',
-                                re.DOTALL
-                            )
-                            greedy_match = greedy_pattern.search(
-                                normalized[match_obj.start():]
-                            )
+                        greedy_pattern = _GREEDY_PATTERNS.get(match_format)
+                        if greedy_pattern is not None:
+                            # Try greedy match from this position (in place, no slice copy)
+                            greedy_match = greedy_pattern.search(normalized, match_obj.start())
                             if greedy_match:
                                 try:
                                     greedy_parsed = self._parse_format(
                                         greedy_match.group(1),
-                                        format_name
+                                        match_format
                                     )
                                     if greedy_parsed:
-                                        tool_calls.extend(greedy_parsed)
+                                        if not self._add_unique_tool_calls(tool_calls, seen, greedy_parsed):
+                                            return None
                                         continue
                                 except json.JSONDecodeError:
                                     pass
+                        if match_format in _WRAPPER_FORMATS:
+                            # The single wrapper pass consumed this block, so a
+                            # wrapper nested in it (<tool_call><function>...)
+                            # is only reachable by scanning its body again
+                            nested = self._parse_nested_wrappers(match_obj.group(match_obj.lastindex))
+                            if not self._add_unique_tool_calls(tool_calls, seen, nested):
+                                return None
                         # Skip this match
                         continue
                     except ToolParseError:
@@ -251,25 +519,12 @@ class QwenToolParser(ToolParserBase):
                         raise
 
             # Final timeout check
-            self._validate_timeout(start_time)
+            self._check_deadline(start_ns, deadline_ns)
 
             # Return empty list if no tool calls found (but format was detected)
             # Return None only if no valid format was detected
             if not tool_calls:
-                # Check if any format was actually present
-                for pattern in self.patterns.values():
-                    if pattern.search(normalized):
-                        # Format was present but empty - return empty list
-                        return []
-                # No format detected at all - return None
-                return None
-
-            # Deduplicate tool calls (same name + same arguments = duplicate)
-            tool_calls = self._deduplicate_tool_calls(tool_calls)
-
-            # Validate structure
-            if not self.validate(tool_calls):
-                return None
+                return [] if match_count else None
 
             return tool_calls
 
@@ -311,6 +566,82 @@ class QwenToolParser(ToolParserBase):
 
         return True
 
+    def _iter_wrapper_matches(self, text: str):
+        """
+        Yield (format_name, match) for the tag-wrapped JSON formats (1-5, 9)
+
+        Normally one _WRAPPER_RE pass covers them all. If some format has an
+        opening after its own last closing tag, that arm would fail from each
+        such opening after scanning to the end of the text, so the formats are
+        then scanned one at a time, each bounded by its own last closing tag.
+
+        Args:
+            text: Normalized model output
+
+        Yields:
+            Tuples of (format name, match object whose last group is the body)
+        """
+        ends = {}
+        single_pass = True
+        for name in _WRAPPER_FORMATS:
+            end = _last_end(text, _PATTERN_CLOSERS[name])
+            if end != -1:
+                ends[name] = end
+            if max(text.rfind(opener) for opener in _WRAPPER_OPENERS[name]) > end:
+                single_pass = False  # Opening after the last closing tag (or with none)
+
+        if not ends:
+            return
+
+        if single_pass:
+            for match_obj in _WRAPPER_RE.finditer(text, 0, max(ends.values())):
+                yield _WRAPPER_FORMATS[match_obj.lastindex - 1], match_obj
+            return
+
+        for name, endpos in ends.items():
+            for match_obj in self.patterns[name].finditer(text, 0, endpos):
+                yield name, match_obj
+
+    def _parse_nested_wrappers(self, body: str) -> List[Dict]:
+        """
+        Parse wrapper-format blocks nested in a wrapper body that held no tool call
+
+        Each level's body stops at the first closing tag of its own format,
+        so nesting can't go deeper than the number of wrapper formats.
+
+        Args:
+            body: Body of a wrapper match, e.g. '<function>{...}</function>'
+
+        Returns:
+            Tool calls found in the nested blocks (possibly empty)
+        """
+        tool_calls = []
+        for name, match_obj in self._iter_wrapper_matches(body):
+            inner = match_obj.group(match_obj.lastindex)
+            try:
+                parsed = self._parse_format(inner, name)
+            except json.JSONDecodeError:
+                parsed = None
+            tool_calls.extend(parsed or self._parse_nested_wrappers(inner))
+        return tool_calls
+
+    def _check_deadline(self, start_ns: int, deadline_ns: int) -> None:
+        """
+        Validate parse hasn't exceeded timeout (one integer compare)
+
+        Args:
+            start_ns: Parse start time from time.monotonic_ns()
+            deadline_ns: start_ns plus the timeout, computed once per parse
+
+        Raises:
+            ToolParseError: If timeout exceeded
+        """
+        now_ns = time.monotonic_ns()
+        if now_ns > deadline_ns:
+            raise ToolParseError(
+                f"Parse timeout exceeded: {(now_ns - start_ns) / 1_000_000:.1f}ms > {self.timeout_ms}ms"
+            )
+
     def _normalize_output(self, text: str) -> str:
         """
         Normalize model output before parsing
@@ -323,16 +654,17 @@ class QwenToolParser(ToolParserBase):
         Returns:
             Normalized text
         """
-        # Strip markdown code blocks
-        text = re.sub(r'```(?:xml|json)?\s*(.*?)\s*```', r'\1', text, flags=re.DOTALL)
+        # Strip markdown code blocks (skip the DOTALL scan when there are none)
+        if '```' in text:
+            text = _CODE_BLOCK_RE.sub(r'\1', text)
+
+        # Single-line responses only need an outer strip
+        if '\n' not in text:
+            return text.strip()
 
         # Normalize whitespace (but preserve newlines in JSON)
         # Just strip leading/trailing whitespace per line
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
-        text = '\n'.join(lines)
-
-        return text
+        return '\n'.join([line.strip() for line in text.split('\n')])
 
     def _parse_format(self, match: str, format_name: str, tool_name: str = None) -> List[Dict]:
         """
@@ -349,106 +681,159 @@ class QwenToolParser(ToolParserBase):
         Raises:
             json.JSONDecodeError: If JSON is malformed
         """
-        tool_calls = []
+        # One dict lookup per match instead of walking an if/elif chain
+        return self._FORMAT_HANDLERS[format_name](self, match.strip(), tool_name)
+
+    def _handle_tag_with_attrs(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 6: <ToolName arg="value"/> - parse XML attributes"""
+        # tool_name is the tag name (e.g., "Read", "Bash")
+        # match is the attributes string (e.g., 'command="ls /tmp"')
+        arguments = self._parse_xml_attributes(match)
+        if tool_name and arguments is not None:
+            return [{'name': tool_name, 'arguments': arguments}]
+        return []
+
+    def _handle_function_attrs(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 7: <function name="X" arguments='Y'/>"""
+        # tool_name is from the name attribute, match is the arguments JSON
+        try:
+            arguments = _json_loads(match)
+        except json.JSONDecodeError:
+            return []  # Skip malformed JSON
+        if tool_name and isinstance(arguments, dict):
+            return [{'name': tool_name, 'arguments': arguments}]
+        return []
+
+    def _handle_function_equals(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 11: <function=Read><parameter=file_path>/path/to/file"""
+        # Parse <parameter=key>value pairs from match
+        arguments = self._parse_parameter_tags(match)
+        if tool_name and arguments:
+            return [{'name': tool_name, 'arguments': arguments}]
+        return []
+
+    def _handle_phi4_functools(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 12: functools[{"name": "func", "arguments": {...}}]"""
+        # Parse JSON array or object inside functools[]
+        try:
+            # Try parsing as JSON array first
+            content = _json_loads(f'[{match}]') if not match.startswith('[') else _json_loads(match)
+        except json.JSONDecodeError:
+            return []  # Skip malformed JSON
+        return self._tool_calls_from_json(content)
+
+    def _handle_gemma_function_call(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 13: <start_function_call>call:func{key:value}<end_function_call>"""
+        # Parse key:value pairs from the arguments string
+        arguments = self._parse_gemma_args(match)
+        if tool_name:
+            return [{'name': tool_name, 'arguments': arguments if arguments else {}}]
+        return []
+
+    def _handle_tools(self, match: str, tool_name: str) -> List[Dict]:
+        """Format 2: <tools>[...]</tools> - array of tool calls"""
+        # Empty or non-JSON bodies can't hold a call; skip them without paying
+        # for a raised JSONDecodeError (a greedy retry would start the same way)
+        if match[:1] not in ('[', '{'):
+            return []
+
+        # Handle both array and single object
+        return self._tool_calls_from_json(_json_loads(match))
+
+    def _handle_json_object(self, match: str, tool_name: str) -> List[Dict]:
+        """Formats 1, 3, 4, 5, 8, 9, 10: Single tool call as JSON object"""
+        if match[:1] != '{':
+            return []  # Empty or not an object - no exception needed to tell
+
+        tool_obj = _json_loads(match)
+
+        if isinstance(tool_obj, dict) and 'name' in tool_obj:
+            return [{'name': tool_obj['name'], 'arguments': tool_obj.get('arguments', {})}]
+        return []
+
+    def _tool_calls_from_json(self, content: Any) -> List[Dict]:
+        """Collect tool calls from a decoded JSON array or single object"""
+        if isinstance(content, dict):
+            content = [content]
+        elif not isinstance(content, list):
+            return []
+
+        return [
+            {'name': item['name'], 'arguments': item.get('arguments', {})}
+            for item in content
+            if isinstance(item, dict) and 'name' in item
+        ]
+
+    # Format name -> handler for _parse_format(), built once with the class
+    # (plain functions, called with the parser instance as the first argument)
+    _FORMAT_HANDLERS = {
+        'tool_call': _handle_json_object,
+        'tools': _handle_tools,
+        'function': _handle_json_object,
+        'response': _handle_json_object,
+        'function_call': _handle_json_object,
+        'json_bracket': _handle_json_object,
+        'tag_with_attrs': _handle_tag_with_attrs,
+        'function_attrs': _handle_function_attrs,
+        'raw_json_block': _handle_json_object,
+        'bare_json': _handle_json_object,
+        'function_equals': _handle_function_equals,
+        'phi4_functools': _handle_phi4_functools,
+        'gemma_function_call': _handle_gemma_function_call,
+    }
+
+    def _find_bare_json(self, text: str) -> List[str]:
+        """
+        Extract balanced bare JSON tool call objects
 
-        # Strip whitespace
-        match = match.strip()
-
-        if format_name == 'tag_with_attrs':
-            # Format 6: <ToolName arg="value"/> - parse XML attributes
-            # tool_name is the tag name (e.g., "Read", "Bash")
-            # match is the attributes string (e.g., 'command="ls /tmp"')
-            arguments = self._parse_xml_attributes(match)
-            if tool_name and arguments is not None:
-                tool_calls.append({
-                    'name': tool_name,
-                    'arguments': arguments
-                })
-
-        elif format_name == 'function_attrs':
-            # Format 7: <function name="X" arguments='Y'/>
-            # tool_name is from the name attribute, match is the arguments JSON
-            try:
-                arguments = json.loads(match)
-                if tool_name and isinstance(arguments, dict):
-                    tool_calls.append({
-                        'name': tool_name,
-                        'arguments': arguments
-                    })
-            except json.JSONDecodeError:
-                pass  # Skip malformed JSON
-
-        elif format_name == 'function_equals':
-            # Format 11: <function=Read><parameter=file_path>/path/to/file
-            # Parse <parameter=key>value pairs from match
-            arguments = self._parse_parameter_tags(match)
-            if tool_name and arguments:
-                tool_calls.append({
-                    'name': tool_name,
-                    'arguments': arguments
-                })
-
-        elif format_name == 'phi4_functools':
-            # Format 12: functools[{"name": "func", "arguments": {...}}]
-            # Parse JSON array or object inside functools[]
-            try:
-                # Try parsing as JSON array first
-                content = json.loads(f'[{match}]') if not match.startswith('[') else json.loads(match)
-                if isinstance(content, list):
-                    for item in content:
-                        if isinstance(item, dict) and 'name' in item:
-                            tool_calls.append({
-                                'name': item['name'],
-                                'arguments': item.get('arguments', {})
-                            })
-                elif isinstance(content, dict) and 'name' in content:
-                    tool_calls.append({
-                        'name': content['name'],
-                        'arguments': content.get('arguments', {})
-                    })
-            except json.JSONDecodeError:
-                pass  # Skip malformed JSON
-
-        elif format_name == 'gemma_function_call':
-            # Format 13: <start_function_call>call:func{key:value}<end_function_call>
-            # Parse key:value pairs from the arguments string
-            arguments = self._parse_gemma_args(match)
-            if tool_name:
-                tool_calls.append({
-                    'name': tool_name,
-                    'arguments': arguments if arguments else {}
-                })
-
-        elif format_name == 'tools':
-            # Format 2: <tools>[...]</tools> - array of tool calls
-            tools_array = json.loads(match)
-
-            # Handle both array and single object
-            if isinstance(tools_array, list):
-                for tool in tools_array:
-                    if isinstance(tool, dict) and 'name' in tool:
-                        tool_calls.append({
-                            'name': tool['name'],
-                            'arguments': tool.get('arguments', {})
-                        })
-            elif isinstance(tools_array, dict) and 'name' in tools_array:
-                # Single tool in array format
-                tool_calls.append({
-                    'name': tools_array['name'],
-                    'arguments': tools_array.get('arguments', {})
-                })
-
-        else:
-            # Formats 1, 3, 4: Single tool call as JSON object
-            tool_obj = json.loads(match)
-
-            if isinstance(tool_obj, dict) and 'name' in tool_obj:
-                tool_calls.append({
-                    'name': tool_obj['name'],
-                    'arguments': tool_obj.get('arguments', {})
-                })
+        Walks the text once from the first {"name": ..., "arguments": header,
+        hopping between braces and whole string literals, and records where
+        each brace closes. Candidates nested inside an earlier one are part of
+        its arguments and are not returned separately.
 
-        return tool_calls
+        Args:
+            text: Normalized model output
+
+        Returns:
+            Substrings spanning each outermost balanced candidate object
+        """
+        starts = [m.start(1) for m in self.patterns['bare_json'].finditer(text)]
+        if not starts:
+            return []
+
+        closes = {}
+        stack = []
+        next_start = 0
+        pos = starts[0]
+        while True:
+            for token in _JSON_TOKEN_RE.finditer(text, pos):
+                char = text[token.start()]
+                if char == '{':
+                    stack.append(token.start())
+                elif char == '}' and stack:
+                    closes[stack.pop()] = token.end()
+                    if not stack:
+                        pos = token.end()
+                        break
+            else:
+                break  # Reached end of text
+
+            # Back at top level - resume at the next header after this object
+            while next_start < len(starts) and starts[next_start] < pos:
+                next_start += 1
+            if next_start == len(starts):
+                break
+            pos = starts[next_start]
+
+        candidates = []
+        covered_until = 0
+        for start in starts:
+            if start < covered_until or start not in closes:
+                continue
+            covered_until = closes[start]
+            candidates.append(text[start:covered_until])
+
+        return candidates
 
     def _parse_xml_attributes(self, attrs_str: str) -> Optional[Dict]:
         """
@@ -463,15 +848,13 @@ class QwenToolParser(ToolParserBase):
         arguments = {}
 
         # Match attributes: name="value" or name='value'
-        attr_pattern = re.compile(r'(\w+)\s*=\s*["\']([^"\']*)["\']')
-
-        for attr_match in attr_pattern.finditer(attrs_str):
+        for attr_match in _ATTR_RE.finditer(attrs_str):
             attr_name = attr_match.group(1)
             attr_value = attr_match.group(2)
 
             # Try to parse value as JSON for nested objects/arrays
             try:
-                arguments[attr_name] = json.loads(attr_value)
+                arguments[attr_name] = _json_loads(attr_value)
             except json.JSONDecodeError:
                 # Keep as string
                 arguments[attr_name] = attr_value
@@ -492,18 +875,13 @@ class QwenToolParser(ToolParserBase):
 
         # Match <parameter=key>value pattern
         # Value extends until next <parameter= or end of string
-        param_pattern = re.compile(
-            r'<parameter=([^>]+)>([^<]*)',
-            re.DOTALL
-        )
-
-        for match in param_pattern.finditer(params_str):
+        for match in _PARAM_RE.finditer(params_str):
             key = match.group(1).strip()
             value = match.group(2).strip()
 
             # Try to parse value as JSON for nested objects/arrays
             try:
-                arguments[key] = json.loads(value)
+                arguments[key] = _json_loads(value)
             except json.JSONDecodeError:
                 # Keep as string
                 arguments[key] = value
@@ -536,58 +914,55 @@ class QwenToolParser(ToolParserBase):
         arguments = {}
 
         # First, handle escape tags - replace <escape>content</escape> with just content
-        args_str = re.sub(r'<escape>(.*?)</escape>', r'\1', args_str)
+        args_str = _ESCAPE_RE.sub(r'\1', args_str)
 
-        # Find all key:value pairs
-        # Pattern: key is word chars at start or after space, followed by colon, value until next key or end
-        # Use findall with a pattern that captures key and value
-        pattern = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*):([^:]*?)(?=\s+[a-zA-Z_][a-zA-Z0-9_]*:|$)')
-
-        for match in pattern.finditer(args_str):
-            key = match.group(1).strip()
-            value = match.group(2).strip()
+        # Locate every key once, then slice each value up to the next key (linear)
+        keys = list(_GEMMA_KEY_RE.finditer(args_str))
+        for i, match in enumerate(keys):
+            key = match.group(1)
+            value_end = keys[i + 1].start() if i + 1 < len(keys) else len(args_str)
+            value = args_str[match.end():value_end].strip()
 
             # Try to parse value as JSON for nested objects/arrays/numbers
             try:
-                arguments[key] = json.loads(value)
+                arguments[key] = _json_loads(value)
             except json.JSONDecodeError:
                 # Keep as string
                 arguments[key] = value
 
         return arguments if arguments else {}
 
-    def _deduplicate_tool_calls(self, tool_calls: List[Dict]) -> List[Dict]:
+    def _add_unique_tool_calls(self, tool_calls: List[Dict], seen: Set[Tuple], new_calls: List[Dict]) -> bool:
         """
-        Remove duplicate tool calls (same name + same arguments)
+        Validate and append tool calls that aren't duplicates (same name + same arguments)
 
         Multiple patterns may match the same tool call JSON, causing duplicates.
-        This method removes them while preserving order.
+        Checking at insertion keeps the list duplicate-free while preserving order,
+        and applies validate()'s structure check without a second pass.
 
         Args:
-            tool_calls: List of parsed tool calls
+            tool_calls: Tool calls collected so far (appended to in place)
+            seen: Keys of the calls already in tool_calls (updated in place)
+            new_calls: Newly parsed tool calls
 
         Returns:
-            Deduplicated list of tool calls
+            False if a call fails validation (the whole parse is rejected)
         """
-        seen = set()
-        unique_calls = []
+        for call in new_calls:
+            # Format handlers always build {'name', 'arguments'} dicts, so the
+            # arguments type is the only part of validate() that can fail here
+            arguments = call['arguments']
+            if not isinstance(arguments, dict):
+                return False
 
-        for call in tool_calls:
-            # Create a hashable key from name + sorted arguments
-            name = call.get('name', '')
-            args = call.get('arguments', {})
-            # Convert args to sorted tuple of items for hashing
-            args_key = tuple(sorted(
-                (k, json.dumps(v, sort_keys=True) if isinstance(v, (dict, list)) else str(v))
-                for k, v in args.items()
-            ))
-            key = (name, args_key)
+            # Hashable key from name + arguments, built without re-serializing
+            key = (_freeze(call['name']), _freeze(arguments))
 
             if key not in seen:
                 seen.add(key)
-                unique_calls.append(call)
+                tool_calls.append(call)
 
-        return unique_calls
+        return True
 
 
 __all__ = ['QwenToolParser', 'ToolParseError']
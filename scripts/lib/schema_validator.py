@@ -3,6 +3,9 @@ JSON Schema validator for OpenAI function calling format
 
 Provides fast, secure validation of tool call parameters against JSON Schema definitions.
 Uses jsonschema library for full Draft 2020-12 support with security hardening.
+When fastjsonschema is installed, schemas are compiled to specialized Python
+validators; jsonschema still checks the schemas themselves and reports the
+errors, so messages don't depend on which backend is installed.
 
 Features:
 - Pre-compiled validators for <10ms validation overhead
@@ -18,14 +21,20 @@ Performance targets:
 Security hardening:
 - Input size limit: 10KB per tool call
 - Schema complexity limits: max depth 10, max properties 100
-- Timeout protection: 5 second hard limit
+- Timeout protection: 5 second hard limit for schemas that can validate
+  slowly, e.g. with pattern (SIGALRM on the main thread, worker thread
+  elsewhere)
 - No code execution in schemas
 """
 
+import concurrent.futures
+import hashlib
 import json
+import signal
+import threading
 import time
-from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
+from collections import deque
+from typing import Callable, Dict, Any, Optional, List
 import logging
 
 try:
@@ -36,9 +45,37 @@ except ImportError:
     HAS_JSONSCHEMA = False
     logging.warning("[Schema Validator] jsonschema library not available - validation disabled")
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fastjsonschema
+    HAS_FASTJSONSCHEMA = True
+except ImportError:
+    HAS_FASTJSONSCHEMA = False
+
 logger = logging.getLogger(__name__)
 
 
+# Keywords that document a schema but never affect validation
+_ANNOTATION_KEYWORDS = frozenset(('title', 'description', 'examples', '$comment'))
+
+# Python types accepted without further checks by _build_fast_path. Exact
+# type() matches only: anything else (bool for integer, 1.0 for integer,
+# subclasses) goes through the full validator.
+_FAST_PATH_TYPES = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'null': (type(None),),
+    'object': (dict,),
+    'array': (list,),
+}
+_FAST_PATH_KEYWORDS = frozenset(('type', 'properties', 'required', 'additionalProperties'))
+
 # Security limits
 MAX_INPUT_SIZE_BYTES = 10 * 1024  # 10KB per tool call
 MAX_SCHEMA_DEPTH = 10  # Maximum nesting depth
@@ -46,23 +83,317 @@ MAX_SCHEMA_PROPERTIES = 100  # Maximum properties per schema
 VALIDATION_TIMEOUT_SEC = 5.0  # Hard timeout for validation
 
 
-@dataclass
+def _json_size(obj: Any) -> int:
+    """
+    Serialized size of obj in bytes
+
+    Args:
+        obj: JSON-compatible value
+
+    Returns:
+        Length of the compact UTF-8 JSON encoding (what orjson produces), so
+        the size limit gives the same verdict with or without orjson
+    """
+    if orjson is not None:
+        try:
+            return len(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; json handles them
+    # surrogatepass: lone surrogates (which orjson rejects) still get a size
+    return len(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8', 'surrogatepass'))
+
+
+class _ValidationTimeout(Exception):
+    """Raised when validation exceeds its time budget"""
+    pass
+
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Shared worker pool for validations that cannot use SIGALRM"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="schema-validator"
+                )
+    return _executor
+
+
+# SIGALRM handling: the handler is installed once (on the main thread) and
+# only raises while a validation is timed, so a late alarm can never reach a
+# restored handler. Alarms outside a validation go to the previous Python
+# handler, if there was one.
+_alarm_armed = False
+_previous_alarm_handler: Any = None
+
+
+def _raise_timeout(signum, frame):
+    if _alarm_armed:
+        raise _ValidationTimeout()
+    if callable(_previous_alarm_handler):
+        _previous_alarm_handler(signum, frame)
+
+
+def _run_with_timeout(fn, timeout: float):
+    """
+    Call fn, giving up after timeout seconds
+
+    On the main thread a SIGALRM timer interrupts fn itself. Elsewhere (or
+    when another timer is already armed) fn runs on a worker thread and the
+    caller stops waiting; the worker finishes in the background.
+
+    Args:
+        fn: Zero-argument callable
+        timeout: Time budget in seconds
+
+    Returns:
+        Return value of fn
+
+    Raises:
+        _ValidationTimeout: If fn did not finish in time
+    """
+    global _alarm_armed, _previous_alarm_handler
+    if (hasattr(signal, 'setitimer')
+            and threading.current_thread() is threading.main_thread()
+            and signal.getitimer(signal.ITIMER_REAL)[0] == 0):
+        handler = signal.getsignal(signal.SIGALRM)
+        if handler is not _raise_timeout:
+            _previous_alarm_handler = handler
+            signal.signal(signal.SIGALRM, _raise_timeout)
+        _alarm_armed = True
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return fn()
+        finally:
+            _alarm_armed = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    future = _get_executor().submit(fn)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise _ValidationTimeout()
+
+
+def _build_fast_path(schema: Dict[str, Any]) -> Optional[Callable[[Any], bool]]:
+    """
+    Specialized check for flat object schemas like Read and Write
+
+    Only covers objects whose properties are plain {"type": ...} schemas,
+    with optional required and boolean additionalProperties.
+
+    Args:
+        schema: Prepared schema (annotations already removed)
+
+    Returns:
+        Callable returning True when arguments are certainly valid (False
+        means "run the full validator"), or None if the schema is not flat
+    """
+    if schema.get('type') != 'object' or not _FAST_PATH_KEYWORDS.issuperset(schema):
+        return None
+
+    property_types = {}
+    for name, prop in schema.get('properties', {}).items():
+        if not isinstance(prop, dict) or prop.keys() != {'type'}:
+            return None
+        types = _FAST_PATH_TYPES.get(prop['type']) if isinstance(prop['type'], str) else None
+        if types is None:
+            return None
+        property_types[name] = types
+
+    required = schema.get('required', [])
+    additional = schema.get('additionalProperties', True)
+    if not isinstance(required, list) or not isinstance(additional, bool):
+        return None
+    required = tuple(required)
+    closed = not additional
+
+    def fast_path(arguments: Any) -> bool:
+        if type(arguments) is not dict:
+            return False
+        for name in required:
+            if name not in arguments:
+                return False
+        for name, value in arguments.items():
+            types = property_types.get(name)
+            if types is None:
+                if closed:
+                    return False
+            elif type(value) not in types:
+                return False
+        return True
+
+    return fast_path
+
+
+# Keywords whose cost isn't bounded by the input size alone (regexes can
+# backtrack, uniqueItems compares every pair, $ref can recurse)
+_SLOW_KEYWORDS = frozenset(('pattern', 'patternProperties', 'uniqueItems', '$ref'))
+# Keywords holding a mapping of name -> subschema
+_SUBSCHEMA_MAP_KEYWORDS = ('properties', 'definitions', '$defs', 'dependencies')
+# Keywords holding one subschema (or a list of them, for items)
+_SUBSCHEMA_KEYWORDS = (
+    'items', 'additionalItems', 'additionalProperties', 'contains',
+    'propertyNames', 'not', 'if', 'then', 'else',
+)
+
+
+def _needs_timeout(schema: Any, in_union: bool = False) -> bool:
+    """
+    Whether validating against schema can run long enough to need a time budget
+
+    Arguments are capped at MAX_INPUT_SIZE_BYTES and schemas at
+    MAX_SCHEMA_DEPTH, so validation is fast unless the schema uses a slow
+    keyword or nests anyOf/oneOf (each level can re-validate the instance
+    once per branch).
+
+    Args:
+        schema: Prepared schema or subschema
+        in_union: Whether schema is a branch of an anyOf/oneOf
+
+    Returns:
+        True if validation should run under _run_with_timeout
+    """
+    if not isinstance(schema, dict):
+        return False
+    if not _SLOW_KEYWORDS.isdisjoint(schema):
+        return True
+
+    for keyword in _SUBSCHEMA_MAP_KEYWORDS:
+        subschemas = schema.get(keyword)
+        if isinstance(subschemas, dict):
+            if any(_needs_timeout(sub, in_union) for sub in subschemas.values()):
+                return True
+    for keyword in _SUBSCHEMA_KEYWORDS:
+        sub = schema.get(keyword)
+        subschemas = sub if isinstance(sub, list) else (sub,)
+        if any(_needs_timeout(item, in_union) for item in subschemas):
+            return True
+    for keyword in ('anyOf', 'oneOf', 'allOf'):
+        branches = schema.get(keyword)
+        if isinstance(branches, list):
+            if keyword != 'allOf' and in_union:
+                return True
+            branch_in_union = in_union or keyword != 'allOf'
+            if any(_needs_timeout(branch, branch_in_union) for branch in branches):
+                return True
+    return False
+
+
+def _schema_hash(schema: Dict[str, Any]) -> str:
+    """
+    Content hash of a schema, independent of key order
+
+    Args:
+        schema: JSON Schema definition
+
+    Returns:
+        Hex digest identifying the schema
+    """
+    payload = None
+    if orjson is not None:
+        try:
+            payload = orjson.dumps(schema, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; json handles them
+    if payload is None:
+        payload = json.dumps(schema, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _estimate_json_size(obj: Any) -> float:
+    """
+    Upper bound on _json_size(obj) without serializing
+
+    Args:
+        obj: JSON-compatible value
+
+    Returns:
+        Size bound in bytes (inf for values that may not serialize)
+    """
+    if isinstance(obj, str):
+        # Worst case every character is a control character escaped as
+        # \uXXXX; others take at most 4 UTF-8 bytes. Long strings end up
+        # measured exactly.
+        return 6 * len(obj) + 2
+    if obj is None or isinstance(obj, bool):
+        return 5
+    if isinstance(obj, int):
+        return len(repr(obj))
+    if isinstance(obj, float):
+        return 24  # longest float repr, e.g. -1.2345678901234567e-308
+    if isinstance(obj, dict):
+        # ':' and ',' around every entry (compact separators)
+        size = 2
+        for key, value in obj.items():
+            key_str = key if isinstance(key, str) else str(key)
+            size += _estimate_json_size(key_str) + 2 + _estimate_json_size(value)
+        return size
+    if isinstance(obj, (list, tuple)):
+        size = 2
+        for item in obj:
+            size += _estimate_json_size(item) + 1
+        return size
+    return float('inf')
+
+
 class ValidationResult:
     """
     Structured validation result with detailed error context
 
+    A plain class with __slots__ rather than @dataclass(slots=True), which
+    needs Python 3.10; __init__, __repr__ and __eq__ match the dataclass.
+
     Attributes:
         is_valid: Whether validation passed
         error_message: User-friendly error message (None if valid)
         error_path: JSONPath to error location (e.g., "$.parameters.file_path")
         tool_name: Name of tool being validated
         validation_time_ms: Time taken for validation
+        all_errors: Every error message, only with collect_all_errors=True
     """
-    is_valid: bool
-    error_message: Optional[str] = None
-    error_path: Optional[str] = None
-    tool_name: Optional[str] = None
-    validation_time_ms: float = 0.0
+
+    __slots__ = (
+        'is_valid', 'error_message', 'error_path', 'tool_name',
+        'validation_time_ms', 'all_errors',
+    )
+
+    def __init__(
+        self,
+        is_valid: bool,
+        error_message: Optional[str] = None,
+        error_path: Optional[str] = None,
+        tool_name: Optional[str] = None,
+        validation_time_ms: float = 0.0,
+        all_errors: Optional[List[str]] = None
+    ):
+        self.is_valid = is_valid
+        self.error_message = error_message
+        self.error_path = error_path
+        self.tool_name = tool_name
+        self.validation_time_ms = validation_time_ms
+        self.all_errors = all_errors
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    # Mutable and compared by value, like an eq=True dataclass
+    __hash__ = None
 
 
 class ValidationError(Exception):
@@ -79,27 +410,43 @@ class SchemaValidator:
 
     Usage:
         validator = SchemaValidator(timeout_sec=5.0)
-        validator.register_tool_schema("Read", read_schema)
+        validator.preload({"Read": read_schema, "Write": write_schema})
         result = validator.validate_tool_call("Read", {"file_path": "/tmp/file.txt"}, read_schema)
         if not result.is_valid:
             print(f"Validation failed: {result.error_message}")
+
+    Schemas known at startup should be passed to preload() so compilation
+    happens before the first request. Tools seen for the first time in
+    validate_tool_call are still compiled on demand from the given schema.
     """
 
-    def __init__(self, timeout_sec: float = VALIDATION_TIMEOUT_SEC):
+    def __init__(self, timeout_sec: float = VALIDATION_TIMEOUT_SEC, enable_stats: bool = True):
         """
         Initialize schema validator
 
         Args:
             timeout_sec: Maximum time allowed for validation (default: 5.0)
+            enable_stats: Time validations and track stats (default: True)
         """
         self.timeout_sec = timeout_sec
-        self.validators: Dict[str, Draft7Validator] = {}
-        self.stats = {
-            'total_validations': 0,
-            'passed': 0,
-            'failed': 0,
-            'total_time_ms': 0.0
-        }
+        self._stats_enabled = enable_stats
+        # Compiled fastjsonschema callables, or Draft7Validator instances as fallback
+        self.validators: Dict[str, Any] = {}
+        # Compiled validators shared between tools with identical schemas
+        self._schema_hash_to_validator: Dict[str, Any] = {}
+        self._tool_to_hash: Dict[str, str] = {}
+        # Specialized checks for flat schemas, see _build_fast_path
+        self._fast_paths: Dict[str, Callable[[Any], bool]] = {}
+        self._schema_hash_to_fast_path: Dict[str, Callable[[Any], bool]] = {}
+        # Hashes of schemas that can validate slowly (see _needs_timeout); only
+        # these run under a time budget, so other validations never wait for
+        # a worker tied up by a slow one
+        self._timed_hashes = set()
+        # Plain attributes rather than a dict: one store per update
+        self._stat_total = 0
+        self._stat_passed = 0
+        self._stat_failed = 0
+        self._stat_time_ms = 0.0
 
         if not HAS_JSONSCHEMA:
             logger.warning("[Schema Validator] jsonschema not installed - validation will be skipped")
@@ -119,37 +466,87 @@ class SchemaValidator:
             return
 
         try:
-            # Validate schema complexity (security)
-            self._validate_schema_complexity(schema, tool_name)
+            # Reuse the compiled validator for a schema seen before
+            schema_hash = _schema_hash(schema)
+            validator = self._schema_hash_to_validator.get(schema_hash)
+            if validator is not None:
+                self.validators[tool_name] = validator
+                self._tool_to_hash[tool_name] = schema_hash
+                self._install_fast_path(tool_name, self._schema_hash_to_fast_path.get(schema_hash))
+                return
+
+            # Validate schema complexity (security) and drop annotations
+            prepared = self._prepare_schema(schema, tool_name)
+
+            # Validate schema itself (once per distinct schema, with either
+            # backend, so invalid schemas are reported the same way)
+            Draft7Validator.check_schema(schema)
 
             # Pre-compile validator (performance optimization)
-            validator = Draft7Validator(schema)
-            validator.check_schema(schema)  # Validate schema itself
+            if HAS_FASTJSONSCHEMA:
+                # No defaults/format checks: arguments must not be mutated, and
+                # formats are not enforced by the Draft7Validator fallback either
+                validator = fastjsonschema.compile(prepared, use_default=False, use_formats=False)
+            else:
+                validator = Draft7Validator(prepared)
 
+            fast_path = _build_fast_path(prepared)
+            if fast_path is not None:
+                self._schema_hash_to_fast_path[schema_hash] = fast_path
+            if _needs_timeout(prepared):
+                self._timed_hashes.add(schema_hash)
+
+            self._schema_hash_to_validator[schema_hash] = validator
+            self._tool_to_hash[tool_name] = schema_hash
             self.validators[tool_name] = validator
+            self._install_fast_path(tool_name, fast_path)
             logger.debug(f"[Schema Validator] Registered schema for tool: {tool_name}")
 
         except Exception as e:
             raise ValidationError(f"Invalid schema for tool '{tool_name}': {e}")
 
+    def _install_fast_path(self, tool_name: str, fast_path: Optional[Callable[[Any], bool]]) -> None:
+        """Set or clear the fast path for a (re-)registered tool"""
+        if fast_path is None:
+            self._fast_paths.pop(tool_name, None)
+        else:
+            self._fast_paths[tool_name] = fast_path
+
+    def preload(self, tool_schemas: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Pre-compile schemas for a set of tools
+
+        Args:
+            tool_schemas: Mapping of tool name to JSON Schema definition
+
+        Raises:
+            ValidationError: If any schema is invalid or exceeds complexity limits
+        """
+        for tool_name, schema in tool_schemas.items():
+            self.register_tool_schema(tool_name, schema)
+
     def validate_tool_call(
         self,
         tool_name: str,
         arguments: Dict[str, Any],
-        schema: Dict[str, Any]
+        schema: Dict[str, Any],
+        collect_all_errors: bool = False
     ) -> ValidationResult:
         """
         Validate tool parameters against schema
 
+        Validation stops at the first error unless collect_all_errors is set.
+
         Args:
             tool_name: Name of the tool
             arguments: Tool parameters to validate
             schema: JSON Schema definition
+            collect_all_errors: Also report every error in all_errors (slower, for debugging)
 
         Returns:
             ValidationResult with validation status and error details
         """
-        start_time = time.perf_counter()
+        start_time = time.perf_counter() if self._stats_enabled else 0.0
 
         # Fast path: jsonschema not available - skip validation
         if not HAS_JSONSCHEMA:
@@ -161,20 +558,23 @@ class SchemaValidator:
 
         # Validate input size (security: prevent DoS)
         try:
-            input_size = len(json.dumps(arguments))
+            # Cheap upper bound first; serialize only when it may exceed the limit
+            input_size = _estimate_json_size(arguments)
+            if input_size > MAX_INPUT_SIZE_BYTES:
+                input_size = _json_size(arguments)
             if input_size > MAX_INPUT_SIZE_BYTES:
                 return ValidationResult(
                     is_valid=False,
                     error_message=f"Tool parameters exceed {MAX_INPUT_SIZE_BYTES} bytes size limit (got {input_size} bytes)",
                     tool_name=tool_name,
-                    validation_time_ms=(time.perf_counter() - start_time) * 1000
+                    validation_time_ms=self._elapsed_ms(start_time)
                 )
         except Exception as e:
             return ValidationResult(
                 is_valid=False,
                 error_message=f"Failed to serialize parameters: {e}",
                 tool_name=tool_name,
-                validation_time_ms=(time.perf_counter() - start_time) * 1000
+                validation_time_ms=self._elapsed_ms(start_time)
             )
 
         # Get or create validator
@@ -186,62 +586,76 @@ class SchemaValidator:
                     is_valid=False,
                     error_message=str(e),
                     tool_name=tool_name,
-                    validation_time_ms=(time.perf_counter() - start_time) * 1000
+                    validation_time_ms=self._elapsed_ms(start_time)
                 )
 
         validator = self.validators[tool_name]
+        fast_path = self._fast_paths.get(tool_name)
 
         # Validate against schema
         try:
-            # Timeout protection
-            validation_start = time.perf_counter()
-            errors = list(validator.iter_errors(arguments))
-            validation_time = time.perf_counter() - validation_start
-
-            if validation_time > self.timeout_sec:
-                logger.warning(f"[Schema Validator] Validation timeout for {tool_name}: {validation_time:.2f}s")
-                return ValidationResult(
-                    is_valid=False,
-                    error_message=f"Validation timeout ({validation_time:.2f}s > {self.timeout_sec}s)",
-                    tool_name=tool_name,
-                    validation_time_ms=(time.perf_counter() - start_time) * 1000
+            if fast_path is not None and not collect_all_errors and fast_path(arguments):
+                # Flat schema certified valid without the full validator
+                first_error = all_errors = None
+            elif self._tool_to_hash[tool_name] not in self._timed_hashes:
+                # Bounded input and no slow keywords: no time budget needed
+                first_error, all_errors = self._find_errors(
+                    validator, arguments, schema, tool_name, collect_all_errors
                 )
+            else:
+                # Timeout protection: interrupt validation that runs too long
+                try:
+                    first_error, all_errors = _run_with_timeout(
+                        lambda: self._find_errors(validator, arguments, schema, tool_name, collect_all_errors),
+                        self.timeout_sec
+                    )
+                except _ValidationTimeout:
+                    logger.warning(f"[Schema Validator] Validation timeout for {tool_name} (> {self.timeout_sec}s)")
+                    return ValidationResult(
+                        is_valid=False,
+                        error_message=f"Validation timeout (> {self.timeout_sec}s)",
+                        tool_name=tool_name,
+                        validation_time_ms=self._elapsed_ms(start_time)
+                    )
+
+            if first_error is None:
+                error_message = error_path = None
+            else:
+                error_message = self._format_error(first_error, tool_name)
+                error_path = self._extract_path(first_error)
+
+            elapsed_ms = self._elapsed_ms(start_time)
+            if self._stats_enabled:
+                self._stat_total += 1
+                if error_message is None:
+                    self._stat_passed += 1
+                else:
+                    self._stat_failed += 1
+                self._stat_time_ms += elapsed_ms
 
             # No errors - validation passed
-            if not errors:
-                elapsed_ms = (time.perf_counter() - start_time) * 1000
-                self.stats['total_validations'] += 1
-                self.stats['passed'] += 1
-                self.stats['total_time_ms'] += elapsed_ms
-
-                logger.debug(f"[Schema Validator] ✓ Valid: {tool_name} ({elapsed_ms:.2f}ms)")
+            if error_message is None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[Schema Validator] ✓ Valid: {tool_name} ({elapsed_ms:.2f}ms)")
                 return ValidationResult(
                     is_valid=True,
                     tool_name=tool_name,
                     validation_time_ms=elapsed_ms
                 )
 
-            # Validation failed - format error message
-            first_error = errors[0]
-            error_message = self._format_error(first_error, tool_name)
-            error_path = self._extract_path(first_error)
-
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            self.stats['total_validations'] += 1
-            self.stats['failed'] += 1
-            self.stats['total_time_ms'] += elapsed_ms
-
+            # Validation failed
             logger.warning(f"[Schema Validator] ✗ Invalid: {tool_name} - {error_message} ({elapsed_ms:.2f}ms)")
             return ValidationResult(
                 is_valid=False,
                 error_message=error_message,
                 error_path=error_path,
                 tool_name=tool_name,
-                validation_time_ms=elapsed_ms
+                validation_time_ms=elapsed_ms,
+                all_errors=all_errors
             )
 
         except Exception as e:
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            elapsed_ms = self._elapsed_ms(start_time)
             logger.error(f"[Schema Validator] Validation error for {tool_name}: {e}")
             return ValidationResult(
                 is_valid=False,
@@ -250,48 +664,128 @@ class SchemaValidator:
                 validation_time_ms=elapsed_ms
             )
 
-    def _validate_schema_complexity(self, schema: Dict[str, Any], tool_name: str, depth: int = 0) -> None:
+    def _elapsed_ms(self, start_time: float) -> float:
+        """Milliseconds since start_time, or 0.0 when stats are disabled"""
+        if not self._stats_enabled:
+            return 0.0
+        return (time.perf_counter() - start_time) * 1000
+
+    def _find_errors(
+        self,
+        validator,
+        arguments: Dict[str, Any],
+        schema: Dict[str, Any],
+        tool_name: str,
+        collect_all_errors: bool
+    ):
+        """
+        Run the compiled validator
+
+        Args:
+            validator: Compiled validator from register_tool_schema
+            arguments: Tool parameters to validate
+            schema: JSON Schema definition
+            tool_name: Name of tool
+            collect_all_errors: Format every error, not just the first
+
+        Returns:
+            (first_error, all_errors) tuple; first_error is None if valid
+        """
+        if collect_all_errors:
+            # fastjsonschema stops at the first error, so walk the full tree
+            full_validator = validator if isinstance(validator, Draft7Validator) else Draft7Validator(schema)
+            errors = list(full_validator.iter_errors(arguments))
+            all_errors = [self._format_error(error, tool_name) for error in errors]
+            return (errors[0] if errors else None), all_errors
+
+        if HAS_FASTJSONSCHEMA:
+            if self._run_fast_validator(validator, arguments):
+                return None, None
+            # Report the error jsonschema finds, so the message (and which
+            # error comes first) doesn't depend on the backend
+            validator = Draft7Validator(schema)
+        return next(validator.iter_errors(arguments), None), None
+
+    def _run_fast_validator(self, validator, arguments: Dict[str, Any]) -> bool:
         """
-        Validate schema complexity to prevent DoS attacks
+        Run a fastjsonschema-compiled validator
+
+        Args:
+            validator: Callable returned by fastjsonschema.compile
+            arguments: Tool parameters to validate
+
+        Returns:
+            True if arguments are valid
+        """
+        try:
+            validator(arguments)
+        except fastjsonschema.JsonSchemaValueException:
+            return False
+        return True
+
+    def _prepare_schema(self, schema: Dict[str, Any], tool_name: str, depth: int = 0) -> Dict[str, Any]:
+        """
+        Validate schema complexity and build the copy that gets compiled
+
+        One breadth-first walk checks the DoS limits and copies each
+        subschema without annotation keywords, which never affect validation.
 
         Args:
             schema: JSON Schema to validate
             tool_name: Name of tool (for error messages)
-            depth: Current nesting depth
+            depth: Nesting depth of schema itself
+
+        Returns:
+            Copy of schema without annotations (the original is not modified)
 
         Raises:
             ValidationError: If schema exceeds complexity limits
         """
-        # Check maximum depth
-        if depth > MAX_SCHEMA_DEPTH:
-            raise ValidationError(
-                f"Schema for tool '{tool_name}' exceeds maximum nesting depth {MAX_SCHEMA_DEPTH}"
-            )
-
-        # Check maximum properties
-        if 'properties' in schema:
-            num_properties = len(schema['properties'])
-            if num_properties > MAX_SCHEMA_PROPERTIES:
+        root: Dict[str, Any] = {}
+        # (subschema, depth, container for its copy, key in container)
+        pending = deque([(schema, depth, root, 'schema')])
+        while pending:
+            subschema, level, parent, key = pending.popleft()
+
+            # Check maximum depth
+            if level > MAX_SCHEMA_DEPTH:
                 raise ValidationError(
-                    f"Schema for tool '{tool_name}' has {num_properties} properties, "
-                    f"exceeds maximum {MAX_SCHEMA_PROPERTIES}"
+                    f"Schema for tool '{tool_name}' exceeds maximum nesting depth {MAX_SCHEMA_DEPTH}"
                 )
 
-            # Recursively check nested objects
-            for prop_schema in schema['properties'].values():
-                if isinstance(prop_schema, dict):
-                    self._validate_schema_complexity(prop_schema, tool_name, depth + 1)
-
-        # Check array items
-        if 'items' in schema and isinstance(schema['items'], dict):
-            self._validate_schema_complexity(schema['items'], tool_name, depth + 1)
-
-        # Check union types (oneOf, anyOf, allOf)
-        for union_key in ['oneOf', 'anyOf', 'allOf']:
-            if union_key in schema:
-                for subschema in schema[union_key]:
-                    if isinstance(subschema, dict):
-                        self._validate_schema_complexity(subschema, tool_name, depth + 1)
+            prepared = {k: v for k, v in subschema.items() if k not in _ANNOTATION_KEYWORDS}
+            parent[key] = prepared
+
+            # Check maximum properties
+            properties = subschema.get('properties')
+            if properties:
+                num_properties = len(properties)
+                if num_properties > MAX_SCHEMA_PROPERTIES:
+                    raise ValidationError(
+                        f"Schema for tool '{tool_name}' has {num_properties} properties, "
+                        f"exceeds maximum {MAX_SCHEMA_PROPERTIES}"
+                    )
+
+                # Queue nested objects
+                prepared['properties'] = properties = dict(properties)
+                for name, prop in properties.items():
+                    if isinstance(prop, dict):
+                        pending.append((prop, level + 1, properties, name))
+
+            # Check array items
+            items = subschema.get('items')
+            if isinstance(items, dict):
+                pending.append((items, level + 1, prepared, 'items'))
+
+            # Check union types (oneOf, anyOf, allOf)
+            for union_key in ('oneOf', 'anyOf', 'allOf'):
+                if union_key in subschema:
+                    prepared[union_key] = union = list(subschema[union_key])
+                    for index, union_schema in enumerate(union):
+                        if isinstance(union_schema, dict):
+                            pending.append((union_schema, level + 1, union, index))
+
+        return root['schema']
 
     def _format_error(self, error: JsonSchemaValidationError, tool_name: str) -> str:
         """
@@ -369,14 +863,24 @@ class SchemaValidator:
         Returns:
             Dictionary with validation metrics
         """
-        total = self.stats['total_validations']
-        avg_time = self.stats['total_time_ms'] / total if total > 0 else 0.0
-        pass_rate = (self.stats['passed'] / total * 100) if total > 0 else 0.0
+        total = self._stat_total
+        avg_time = self._stat_time_ms / total if total > 0 else 0.0
+        pass_rate = (self._stat_passed / total * 100) if total > 0 else 0.0
 
         return {
             'total_validations': total,
-            'passed': self.stats['passed'],
-            'failed': self.stats['failed'],
+            'passed': self._stat_passed,
+            'failed': self._stat_failed,
             'pass_rate': round(pass_rate, 2),
             'avg_validation_time_ms': round(avg_time, 2)
         }
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Raw counters, in the shape this attribute had before"""
+        return {
+            'total_validations': self._stat_total,
+            'passed': self._stat_passed,
+            'failed': self._stat_failed,
+            'total_time_ms': self._stat_time_ms
+        }
@@ -9,16 +9,43 @@ Optimizes prompt processing by:
 
 import hashlib
 import json
+from collections import deque
 from typing import List, Dict, Any, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+
+def _dumps_sorted(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes with sorted keys"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; json handles them
+    return json.dumps(obj, sort_keys=True).encode()
+
 
 def hash_system_config(system_message: str, tools: List[Dict]) -> str:
     """Hash system prompt + tool definitions for cache key"""
-    config = {
-        "system": system_message,
-        "tools": json.dumps(tools, sort_keys=True) if tools else ""
-    }
-    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+    # Serialized as JSON, so list-of-blocks or missing (None) prompts hash too
+    system_bytes = _dumps_sorted(system_message)
+    hasher = blake3() if blake3 is not None else hashlib.sha256()
+    # Length prefix keeps ("ab", tools) and ("a", "b" + tools) apart
+    hasher.update(len(system_bytes).to_bytes(8, "little"))
+    hasher.update(system_bytes)
+    hasher.update(_dumps_sorted(tools) if tools else b"")
+    if blake3 is not None:
+        # Only 64 bits are kept, so ask for exactly 8 bytes of output
+        return hasher.hexdigest(length=8)
+    return hasher.hexdigest()[:16]
 
 
 def optimize_messages(
@@ -38,30 +65,27 @@ def optimize_messages(
     if not messages:
         return messages, {}
 
-    # Separate system message from conversation
+    # Separate system message from conversation, keeping only recent
+    # history (sliding window) as we go.
+    # This makes prompts more likely to match as conversation grows
     system_msg = None
-    conversation = []
+    recent_conversation = deque(maxlen=max(max_history, 0))
+    system_count = 0
 
     for msg in messages:
         if msg.get("role") == "system":
             system_msg = msg
+            system_count += 1
         else:
-            conversation.append(msg)
-
-    # Keep only recent history (sliding window)
-    # This makes prompts more likely to match as conversation grows
-    recent_conversation = conversation[-max_history:] if len(conversation) > max_history else conversation
+            recent_conversation.append(msg)
 
     # Reconstruct optimized message list
-    optimized = []
-    if system_msg:
-        optimized.append(system_msg)
-    optimized.extend(recent_conversation)
+    optimized = [system_msg, *recent_conversation] if system_msg else list(recent_conversation)
 
     metadata = {
         "original_length": len(messages),
         "optimized_length": len(optimized),
-        "trimmed_messages": len(conversation) - len(recent_conversation),
+        "trimmed_messages": len(messages) - system_count - len(recent_conversation),
         "cache_friendly": len(recent_conversation) <= max_history
     }
 
@@ -14,11 +14,35 @@ Classes:
     - ParserRegistry: Manages parser priority and fallback chain
 """
 
+import array
 import json
 import re
 import time
 import threading
-from typing import Optional, Dict, Any, List, Union
+import weakref
+from enum import IntEnum
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _loads(text: str) -> Any:
+    """
+    Decode JSON with orjson when available, matching json.loads() results
+
+    orjson rejects a few inputs json accepts (NaN/Infinity, integers beyond
+    64 bits), so its errors are retried with json, which also supplies the
+    error raised for genuinely malformed input.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
 
 
 class ToolParseError(Exception):
@@ -36,10 +60,29 @@ class ToolParserBase:
     - validate(): Verify extracted tool calls are well-formed
     """
 
+    __slots__ = ('max_json_size', 'timeout_ms')
+
     # Security limits
     MAX_JSON_SIZE = 1_000_000  # 1MB
     PARSE_TIMEOUT_MS = 100  # 100ms
 
+    # Read the clock once every 16 matches rather than on every match
+    TIMEOUT_CHECK_MASK = 15
+
+    # Substrings a parseable string response must contain at least one of.
+    # ParserRegistry skips can_parse() when none is present; empty = always try
+    prefilter_markers: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """Store a subclass's prefilter_markers as a tuple of strings"""
+        super().__init_subclass__(**kwargs)
+        # Only class-level declarations; a slot (per-instance markers) is left as is
+        markers = cls.__dict__.get('prefilter_markers')
+        if isinstance(markers, str):
+            cls.prefilter_markers = (markers,)
+        elif isinstance(markers, (list, set, frozenset)):
+            cls.prefilter_markers = tuple(markers)
+
     def __init__(self, max_json_size_mb: int = 1, timeout_ms: int = 100):
         """
         Initialize parser with security limits
@@ -94,7 +137,10 @@ class ToolParserBase:
 
     def _validate_json_size(self, text: str) -> None:
         """
-        Validate JSON size doesn't exceed limit
+        Validate JSON size doesn't exceed limit, encoding only when unavoidable
+
+        UTF-8 uses 1-4 bytes per character, so the character count alone
+        settles every response below max_json_size / 4 or above max_json_size.
 
         Args:
             text: JSON text to validate
@@ -102,9 +148,18 @@ class ToolParserBase:
         Raises:
             ToolParseError: If size exceeds limit
         """
-        if len(text.encode('utf-8')) > self.max_json_size:
+        char_count = len(text)
+        if char_count * 4 <= self.max_json_size:
+            return  # Can't exceed the limit even if every character is 4 bytes
+        if char_count > self.max_json_size:
             raise ToolParseError(
-                f"JSON size exceeds limit: {len(text)} bytes > {self.max_json_size} bytes"
+                f"JSON size exceeds limit: {char_count} bytes > {self.max_json_size} bytes"
+            )
+
+        byte_count = len(text.encode('utf-8'))
+        if byte_count > self.max_json_size:
+            raise ToolParseError(
+                f"JSON size exceeds limit: {byte_count} bytes > {self.max_json_size} bytes"
             )
 
     def _validate_timeout(self, start_time: float) -> None:
@@ -143,6 +198,16 @@ class OpenAIToolParser(ToolParserBase):
     }
     """
 
+    __slots__ = ('_decoded',)
+
+    prefilter_markers = ('"tool_calls"',)
+
+    def __init__(self, max_json_size_mb: int = 1, timeout_ms: int = 100):
+        super().__init__(max_json_size_mb, timeout_ms)
+        # Last string decoded by can_parse(), reused by the parse() call that
+        # normally follows it on the same thread
+        self._decoded = threading.local()
+
     def can_parse(self, response: Union[str, Dict, None]) -> bool:
         """Check if response contains OpenAI tool_calls structure"""
         if response is None or response == "":
@@ -151,12 +216,21 @@ class OpenAIToolParser(ToolParserBase):
         try:
             # Handle dict or string input
             if isinstance(response, str):
-                data = json.loads(response)
+                # JSON text with a tool_calls key must contain it verbatim;
+                # rejects plain text without decoding it
+                if '"tool_calls"' not in response:
+                    return False
+                data = _loads(response)
             else:
                 data = response
 
             # Check for tool_calls key
-            return "tool_calls" in data and isinstance(data["tool_calls"], list)
+            if "tool_calls" in data and isinstance(data["tool_calls"], list):
+                if data is not response:
+                    self._decoded.response = response
+                    self._decoded.data = data
+                return True
+            return False
         except (json.JSONDecodeError, TypeError, AttributeError):
             return False
 
@@ -168,7 +242,11 @@ class OpenAIToolParser(ToolParserBase):
             # Validate size if string
             if isinstance(response, str):
                 self._validate_json_size(response)
-                data = json.loads(response)
+                data = self._take_decoded(response)
+                if data is None:
+                    if '"tool_calls"' not in response:
+                        return None
+                    data = _loads(response)
             else:
                 data = response
 
@@ -178,13 +256,13 @@ class OpenAIToolParser(ToolParserBase):
 
             tool_calls = data["tool_calls"]
 
-            # Validate timeout
-            self._validate_timeout(start_time)
-
             # Validate structure
             if not self.validate(tool_calls):
                 return None
 
+            # Validate timeout
+            self._validate_timeout(start_time)
+
             return tool_calls
 
         except ToolParseError:
@@ -193,6 +271,23 @@ class OpenAIToolParser(ToolParserBase):
         except (json.JSONDecodeError, TypeError):
             return None
 
+    def _take_decoded(self, response: str) -> Optional[Dict]:
+        """
+        Return the data can_parse() decoded for this exact string
+
+        Args:
+            response: Response string passed to parse()
+
+        Returns:
+            Decoded data, or None if can_parse() did not just decode it
+        """
+        decoded = self._decoded
+        if getattr(decoded, 'response', None) is not response:
+            return None
+        data = decoded.data
+        decoded.response = decoded.data = None
+        return data
+
     def validate(self, tool_calls: List[Dict]) -> bool:
         """Validate OpenAI tool call structure"""
         if not isinstance(tool_calls, list):
@@ -238,7 +333,12 @@ class CommentaryToolParser(ToolParserBase):
     I'll analyze the contents.
     """
 
-    TOOL_CALL_PATTERN = re.compile(r'\[TOOL_CALL\](.*?)\[/TOOL_CALL\]', re.DOTALL)
+    __slots__ = ()
+
+    prefilter_markers = ('[TOOL_CALL]',)
+
+    OPEN_TAG = '[TOOL_CALL]'
+    CLOSE_TAG = '[/TOOL_CALL]'
 
     def can_parse(self, response: Union[str, Dict, None]) -> bool:
         """Check if response contains [TOOL_CALL] tags"""
@@ -258,34 +358,38 @@ class CommentaryToolParser(ToolParserBase):
             if not isinstance(response, str):
                 return None
 
+            # Cheap substring check before scanning for blocks
+            if self.OPEN_TAG not in response:
+                return None
+
             # Validate size
             self._validate_json_size(response)
 
             # Extract all [TOOL_CALL] blocks
-            matches = self.TOOL_CALL_PATTERN.findall(response)
+            blocks = self._find_blocks(response)
 
-            if not matches:
+            if not blocks:
                 return None
 
+            body_offset = len(self.OPEN_TAG)
+            close_len = len(self.CLOSE_TAG)
             tool_calls = []
-            for match in matches:
+            for index, (start, end) in enumerate(blocks):
+                if index and not index & self.TIMEOUT_CHECK_MASK:
+                    self._validate_timeout(start_time)
                 try:
                     # Parse JSON from tool call block
-                    tool_call = json.loads(match.strip())
+                    tool_call = _loads(response[start + body_offset:end - close_len].strip())
 
                     # Optionally preserve context
                     if preserve_context:
-                        # Find surrounding text
-                        pattern = re.compile(
-                            r'(.*?)\[TOOL_CALL\].*?\[/TOOL_CALL\](.*?)(?=\[TOOL_CALL\]|$)',
-                            re.DOTALL
-                        )
-                        context_match = pattern.search(response)
-                        if context_match:
-                            tool_call['context'] = (
-                                context_match.group(1).strip() + ' ' +
-                                context_match.group(2).strip()
-                            ).strip()
+                        # Surrounding text up to the neighbouring blocks
+                        context_start = blocks[index - 1][1] if index else 0
+                        context_end = blocks[index + 1][0] if index + 1 < len(blocks) else len(response)
+                        tool_call['context'] = (
+                            response[context_start:start].strip() + ' ' +
+                            response[end:context_end].strip()
+                        ).strip()
 
                     tool_calls.append(tool_call)
                 except json.JSONDecodeError:
@@ -301,6 +405,33 @@ class CommentaryToolParser(ToolParserBase):
         except (ToolParseError, TypeError):
             return None
 
+    def _find_blocks(self, response: str) -> List[Tuple[int, int]]:
+        """
+        Find [TOOL_CALL]...[/TOOL_CALL] blocks with str.find
+
+        Pairs each opening tag with the nearest closing tag after it, the same
+        spans a non-greedy regex would match, without the regex engine.
+
+        Args:
+            response: Response text
+
+        Returns:
+            (start, end) span of each block, tags included
+        """
+        open_tag, close_tag = self.OPEN_TAG, self.CLOSE_TAG
+        blocks = []
+        pos = 0
+        while True:
+            start = response.find(open_tag, pos)
+            if start < 0:
+                break
+            close = response.find(close_tag, start + len(open_tag))
+            if close < 0:
+                break
+            pos = close + len(close_tag)
+            blocks.append((start, pos))
+        return blocks
+
     def validate(self, tool_calls: List[Dict]) -> bool:
         """Validate commentary tool call structure"""
         if not isinstance(tool_calls, list):
@@ -324,6 +455,9 @@ class CustomToolParser(ToolParserBase):
     Example: Qwen format uses <tool>...</tool> tags
     """
 
+    # prefilter_markers is per instance here, derived from the patterns
+    __slots__ = ('name', 'patterns', '_literals', 'prefilter_markers')
+
     def __init__(self, name: str = "custom", max_json_size_mb: int = 1, timeout_ms: int = 100):
         """
         Initialize custom parser
@@ -336,6 +470,8 @@ class CustomToolParser(ToolParserBase):
         super().__init__(max_json_size_mb, timeout_ms)
         self.name = name
         self.patterns = {}  # model_name -> regex pattern
+        self._literals = {}  # model_name -> literal prefix of the pattern ('' if none)
+        self.prefilter_markers = ()
 
     def register_pattern(self, model_name: str, pattern: str) -> None:
         """
@@ -346,14 +482,24 @@ class CustomToolParser(ToolParserBase):
             pattern: Regex pattern to extract tool calls
         """
         self.patterns[model_name] = re.compile(pattern, re.DOTALL)
+        self._literals[model_name] = _extract_literal_prefix(pattern)
+
+        # A pattern without a literal prefix can match anywhere, so the
+        # registry prefilter only applies while every pattern has one
+        literals = tuple(self._literals.values())
+        self.prefilter_markers = literals if all(literals) else ()
 
     def can_parse(self, response: Union[str, Dict, None]) -> bool:
         """Check if any registered pattern matches"""
         if response is None or not isinstance(response, str):
             return False
 
-        # Check if any pattern matches
-        for pattern in self.patterns.values():
+        # Check if any pattern matches, skipping the regex when its literal
+        # prefix is absent
+        for model_name, pattern in self.patterns.items():
+            literal = self._literals.get(model_name)
+            if literal and literal not in response:
+                continue
             if pattern.search(response):
                 return True
 
@@ -371,13 +517,18 @@ class CustomToolParser(ToolParserBase):
             self._validate_json_size(response)
 
             # Try each pattern
-            for pattern in self.patterns.values():
+            for model_name, pattern in self.patterns.items():
+                literal = self._literals.get(model_name)
+                if literal and literal not in response:
+                    continue
                 matches = pattern.findall(response)
                 if matches:
                     tool_calls = []
-                    for match in matches:
+                    for index, match in enumerate(matches):
+                        if index and not index & self.TIMEOUT_CHECK_MASK:
+                            self._validate_timeout(start_time)
                         try:
-                            tool_call = json.loads(match.strip())
+                            tool_call = _loads(match.strip())
                             tool_calls.append(tool_call)
                         except json.JSONDecodeError:
                             continue
@@ -403,6 +554,51 @@ class CustomToolParser(ToolParserBase):
         return True
 
 
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]()|')
+_UNESCAPED_PIPE = re.compile(r'(?:^|[^\\])(?:\\\\)*\|')
+
+
+def _extract_literal_prefix(pattern: str) -> str:
+    """
+    Get the literal text every match of a regex pattern must start with
+
+    Conservative: returns '' whenever the prefix is not certain (alternation,
+    inline flags, a leading group or character class).
+
+    Args:
+        pattern: Regex pattern string
+
+    Returns:
+        Literal prefix, or '' if the pattern has none
+    """
+    if _UNESCAPED_PIPE.search(pattern):
+        return ''
+
+    literal = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            # Escaped punctuation is literal; \d, \s, \b, \n etc. are not
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            char = pattern[i + 1]
+            i += 2
+        elif char in _REGEX_METACHARACTERS:
+            break
+        else:
+            i += 1
+
+        # A following quantifier makes this character optional or repeated
+        if i < len(pattern) and pattern[i] in '*?{':
+            break
+        literal.append(char)
+        if i < len(pattern) and pattern[i] == '+':
+            break
+
+    return ''.join(literal)
+
+
 class FallbackParser(ToolParserBase):
     """
     Fallback parser that returns text responses
@@ -411,16 +607,33 @@ class FallbackParser(ToolParserBase):
     Used as last resort when all other parsers fail.
     """
 
+    __slots__ = ()
+
     def can_parse(self, response: Union[str, Dict, None]) -> bool:
         """Always returns True - accepts any input"""
         return True
 
-    def parse(self, response: Union[str, Dict, None], **kwargs) -> Dict:
-        """Return response as text content"""
+    def parse(self, response: Union[str, Dict, None], force_str: bool = True, **kwargs) -> Dict:
+        """
+        Return response as text content
+
+        Args:
+            response: LLM response
+            force_str: Serialize dict responses to JSON text. When False a dict
+                is returned as-is under type "raw", skipping the json.dumps
+                for callers that only inspect it in-process
+        """
         # Convert to string if needed
-        if response is None:
+        if type(response) is str:
+            content = response
+        elif response is None:
             content = ""
         elif isinstance(response, dict):
+            if not force_str:
+                return {
+                    "type": "raw",
+                    "content": response
+                }
             content = json.dumps(response)
         else:
             content = str(response)
@@ -435,6 +648,15 @@ class FallbackParser(ToolParserBase):
         return True
 
 
+class _ParserKind(IntEnum):
+    """Parser categories tracked in ParserRegistry metrics"""
+    OPENAI = 0
+    COMMENTARY = 1
+    CUSTOM = 2
+    FALLBACK = 3
+    UNKNOWN = 4
+
+
 class ParserRegistry:
     """
     Registry for managing parser priority and fallback chain
@@ -443,6 +665,11 @@ class ParserRegistry:
     Provides fallback chain execution and metrics tracking.
     """
 
+    __slots__ = (
+        'parsers', 'priorities', '_sorted_cache', '_counters', '_all_counters',
+        '_retired_counters', 'lock', 'circuit_breaker',
+    )
+
     def __init__(self, circuit_breaker=None):
         """
         Initialize parser registry
@@ -450,20 +677,20 @@ class ParserRegistry:
         Args:
             circuit_breaker: Optional CircuitBreaker for protection
         """
-        self.parsers = []  # List of (parser, priority) tuples
+        # Copy-on-write: register() replaces these under the lock, readers
+        # use whatever snapshot they load without locking
+        self.parsers = ()  # Tuple of (priority, kind, parser) tuples
         self.priorities = {}  # parser -> priority mapping
-        self.metrics = {
-            'openai_attempts': 0,
-            'openai_successes': 0,
-            'commentary_attempts': 0,
-            'commentary_successes': 0,
-            'custom_attempts': 0,
-            'custom_successes': 0,
-            'fallback_attempts': 0,
-            'fallback_successes': 0,
-            'unknown_attempts': 0,
-            'unknown_successes': 0,
-        }
+        self._sorted_cache = ()  # (kind, parser) pairs in priority order
+        # Per-thread attempt/success counters indexed by _ParserKind, so the
+        # parse path never takes the lock; get_metrics() sums them
+        self._counters = threading.local()
+        self._all_counters = []  # (thread ref, attempts, successes) of live threads
+        # Counts folded in from threads that have exited (see _fold_dead_threads)
+        self._retired_counters = (
+            array.array('Q', [0] * len(_ParserKind)),
+            array.array('Q', [0] * len(_ParserKind)),
+        )
         self.lock = threading.Lock()
         self.circuit_breaker = circuit_breaker
 
@@ -475,21 +702,26 @@ class ParserRegistry:
             parser: Parser instance to register
             priority: Priority level (lower = higher priority)
         """
+        # Parser kind for metrics, resolved once instead of per parse
+        kind = self._classify(parser)
+
         with self.lock:
-            self.parsers.append((parser, priority))
-            self.priorities[parser] = priority
-            # Sort by priority (ascending)
-            self.parsers.sort(key=lambda x: x[1])
+            # Sort by priority (ascending); stable, so ties keep registration order
+            parsers = tuple(sorted(self.parsers + ((priority, kind, parser),), key=lambda x: x[0]))
+            priorities = dict(self.priorities)
+            priorities[parser] = priority
+
+            self.parsers = parsers
+            self.priorities = priorities
+            self._sorted_cache = tuple((kind, parser) for _, kind, parser in parsers)
 
     def get_ordered_parsers(self) -> List[ToolParserBase]:
         """Get parsers in priority order"""
-        with self.lock:
-            return [parser for parser, _ in self.parsers]
+        return [parser for _, _, parser in self.parsers]
 
     def get_priority(self, parser: ToolParserBase) -> int:
         """Get priority for parser"""
-        with self.lock:
-            return self.priorities.get(parser, 999)
+        return self.priorities.get(parser, 999)
 
     def parse_with_fallback(self, response: Union[str, Dict, None]) -> Optional[Union[List[Dict], Dict]]:
         """
@@ -504,58 +736,149 @@ class ParserRegistry:
             Parsed tool calls or text response
         """
         def _parse():
-            parsers = self.get_ordered_parsers()
+            attempts, successes = self._thread_counters()
+            return self._run_chain(response, self._sorted_cache, attempts, successes)
 
-            for parser in parsers:
-                # Get parser type for metrics
-                parser_type = self._get_parser_type(parser)
+        return self._call(_parse)
 
-                # Track attempt (even if can_parse returns False)
-                with self.lock:
-                    self.metrics[f'{parser_type}_attempts'] += 1
-
-                # Check if parser can handle this response
-                if not parser.can_parse(response):
-                    continue
+    def parse_batch(self, responses: List[Union[str, Dict, None]]) -> List[Optional[Union[List[Dict], Dict]]]:
+        """
+        Parse several responses using the fallback chain
 
-                # Try to parse
-                result = parser.parse(response)
+        Same results as calling parse_with_fallback() on each response, but
+        the parser chain and metric counters are looked up once and the
+        circuit breaker (if any) guards the batch as a single call.
 
-                if result is not None:
-                    # Track success
-                    with self.lock:
-                        self.metrics[f'{parser_type}_successes'] += 1
-                    return result
+        Args:
+            responses: LLM responses to parse
 
-                # If result is None, try next parser
+        Returns:
+            Parsed tool calls or text response for each input, in order
+        """
+        def _parse():
+            parsers = self._sorted_cache
+            attempts, successes = self._thread_counters()
+            return [
+                self._run_chain(response, parsers, attempts, successes)
+                for response in responses
+            ]
 
-            # No parser succeeded
-            return None
+        return self._call(_parse)
 
+    def _call(self, fn):
+        """Run fn through the circuit breaker if one is configured"""
         # Use circuit breaker if available
         if self.circuit_breaker:
             try:
-                return self.circuit_breaker.call(_parse)
+                return self.circuit_breaker.call(fn)
             except Exception:
                 # Circuit breaker rejected or failed
                 raise
         else:
-            return _parse()
+            return fn()
+
+    @staticmethod
+    def _run_chain(response, parsers, attempts, successes):
+        """Try parsers in order until one returns a result"""
+        is_text = isinstance(response, str)
+
+        for kind, parser in parsers:
+            # Track attempt (even if can_parse returns False)
+            attempts[kind] += 1
+
+            # Skip parsers whose marker substrings are all absent
+            if is_text:
+                markers = parser.prefilter_markers
+                if markers and not any(marker in response for marker in markers):
+                    continue
+
+            # Check if parser can handle this response
+            if not parser.can_parse(response):
+                continue
+
+            # Try to parse
+            result = parser.parse(response)
+
+            if result is not None:
+                # Track success
+                successes[kind] += 1
+                return result
+
+            # If result is None, try next parser
+
+        # No parser succeeded
+        return None
 
     def get_metrics(self) -> Dict[str, int]:
         """Get parser performance metrics"""
+        attempts = [0] * len(_ParserKind)
+        successes = [0] * len(_ParserKind)
         with self.lock:
-            return self.metrics.copy()
+            self._fold_dead_threads()
+            counters = [self._retired_counters]
+            counters.extend(entry[1:] for entry in self._all_counters)
+            for thread_attempts, thread_successes in counters:
+                for kind in _ParserKind:
+                    attempts[kind] += thread_attempts[kind]
+                    successes[kind] += thread_successes[kind]
+
+        metrics = {}
+        for kind in _ParserKind:
+            name = kind.name.lower()
+            metrics[f'{name}_attempts'] = attempts[kind]
+            metrics[f'{name}_successes'] = successes[kind]
+        return metrics
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """Parser performance metrics (same as get_metrics())"""
+        return self.get_metrics()
+
+    def _thread_counters(self):
+        """(attempts, successes) counter arrays owned by the calling thread"""
+        counters = getattr(self._counters, 'arrays', None)
+        if counters is None:
+            counters = (
+                array.array('Q', [0] * len(_ParserKind)),
+                array.array('Q', [0] * len(_ParserKind)),
+            )
+            self._counters.arrays = counters
+            with self.lock:
+                self._fold_dead_threads()
+                self._all_counters.append((weakref.ref(threading.current_thread()), *counters))
+        return counters
 
-    def _get_parser_type(self, parser: ToolParserBase) -> str:
-        """Get parser type name for metrics"""
+    def _fold_dead_threads(self) -> None:
+        """
+        Move the counts of exited threads into the retired totals
+
+        A thread that has exited can't update its arrays any more, so their
+        counts are final. Folding them keeps _all_counters from growing with
+        every thread that ever parsed. Caller must hold the lock.
+        """
+        retired_attempts, retired_successes = self._retired_counters
+        live = []
+        for entry in self._all_counters:
+            thread = entry[0]()
+            if thread is not None and thread.is_alive():
+                live.append(entry)
+                continue
+            _, thread_attempts, thread_successes = entry
+            for kind in _ParserKind:
+                retired_attempts[kind] += thread_attempts[kind]
+                retired_successes[kind] += thread_successes[kind]
+        self._all_counters = live
+
+    @staticmethod
+    def _classify(parser: ToolParserBase) -> _ParserKind:
+        """Get parser kind for metrics"""
         if isinstance(parser, OpenAIToolParser):
-            return 'openai'
+            return _ParserKind.OPENAI
         elif isinstance(parser, CommentaryToolParser):
-            return 'commentary'
+            return _ParserKind.COMMENTARY
         elif isinstance(parser, CustomToolParser):
-            return 'custom'
+            return _ParserKind.CUSTOM
         elif isinstance(parser, FallbackParser):
-            return 'fallback'
+            return _ParserKind.FALLBACK
         else:
-            return 'unknown'
+            return _ParserKind.UNKNOWN
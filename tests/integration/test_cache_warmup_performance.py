@@ -128,6 +128,13 @@ class TestWarmupCompletionTime(unittest.TestCase):
             model = MagicMock()
             tokenizer = MagicMock()
 
+            # Mocks return instantly; give chat templating a real model's
+            # minimal cost so the overhead is measurable
+            def slow_chat_template(*args, **kwargs):
+                time.sleep(0.002)
+                return "<|im_start|>system\nYou are Claude Code.<|im_end|>"
+            tokenizer.apply_chat_template.side_effect = slow_chat_template
+
             start_time = time.time()
 
             result = await warmup_kv_cache(
@@ -27,6 +27,7 @@ Qwen Formats to Support:
 import pytest
 import sys
 import json
+import math
 import time
 import threading
 from pathlib import Path
@@ -169,6 +170,18 @@ class TestQwenFormat1ToolCall:
         assert result[0]['arguments']['timeout'] == 5000
         assert result[0]['arguments']['env']['PATH'] == '/usr/bin'
 
+    def test_parse_tool_call_with_json_only_values(self, parser):
+        """Test parse() accepts NaN and integers beyond 64 bits like json.loads"""
+        response = (
+            '<tool_call>{"name": "Calc", "arguments": '
+            '{"n": 123456789012345678901234567890, "x": NaN}}</tool_call>'
+        )
+        result = parser.parse(response)
+
+        assert result is not None
+        assert result[0]['arguments']['n'] == 123456789012345678901234567890
+        assert math.isnan(result[0]['arguments']['x'])
+
 
 class TestQwenFormat2Tools:
     """Test Format 2: <tools>[...]</tools>"""
@@ -274,6 +287,26 @@ class TestQwenFormat4JSONBracket:
         assert result[0]['name'] == 'Grep'
         assert result[0]['arguments']['pattern'] == 'TODO'
 
+    def test_parse_bare_json_nested_arguments(self, parser):
+        """Test parse() balances braces in nested bare JSON arguments"""
+        response = 'Running:\n{"name": "Bash", "arguments": {"command": "echo }", "env": {"PATH": "/bin"}}}'
+        result = parser.parse(response)
+
+        assert result is not None
+        assert len(result) == 1
+        assert result[0]['arguments']['command'] == 'echo }'
+        assert result[0]['arguments']['env'] == {'PATH': '/bin'}
+
+    def test_parse_multiple_bare_json(self, parser):
+        """Test parse() extracts consecutive bare JSON tool calls"""
+        response = (
+            '{"name": "Read", "arguments": {"file_path": "/a"}}\n'
+            '{"name": "Read", "arguments": {"file_path": "/b"}}'
+        )
+        result = parser.parse(response)
+
+        assert [call['arguments']['file_path'] for call in result] == ['/a', '/b']
+
     def test_parse_json_bracket_with_nested_objects(self, parser):
         """Test parse() handles nested JSON in brackets"""
         response = '''<{
@@ -322,6 +355,12 @@ class TestQwenEdgeCases:
         # Should return None or empty list, not raise exception
         assert result is None or result == []
 
+    def test_parse_returns_empty_list_for_empty_tags(self, parser):
+        """Test parse() returns [] when a format is present but has no JSON body"""
+        assert parser.parse('<tool_call></tool_call>') == []
+        assert parser.parse('<tools>  </tools>') == []
+        assert parser.parse('<function>not json</function>') == []
+
     def test_parse_handles_partial_tool_call_tag(self, parser):
         """Test parse() handles incomplete tags"""
         response = '<tool_call>{"name": "Read"}'  # Missing closing tag
@@ -346,6 +385,16 @@ class TestQwenEdgeCases:
         assert result is not None
         assert len(result) >= 1
 
+    def test_parse_handles_wrapper_nested_in_wrapper(self, parser):
+        """Test parse() finds a wrapper format nested inside another wrapper"""
+        response = (
+            '<tool_call><function>{"name": "Read", "arguments": {"file_path": "/tmp/a"}}'
+            '</function></tool_call>'
+        )
+        result = parser.parse(response)
+
+        assert result == [{'name': 'Read', 'arguments': {'file_path': '/tmp/a'}}]
+
     def test_parse_handles_mixed_formats(self, parser):
         """Test parse() handles multiple format types in one response"""
         response = '''
@@ -359,6 +408,17 @@ class TestQwenEdgeCases:
         assert result is not None
         assert len(result) >= 3  # At least one from each format
 
+    def test_parse_orders_wrapper_formats_by_position(self, parser):
+        """Test parse() returns wrapped tool calls in the order they appear"""
+        response = (
+            '<function>{"name": "Bash", "arguments": {}}</function>\n'
+            '<tool_call>{"name": "Read", "arguments": {}}</tool_call>\n'
+            '<response>{"name": "Write", "arguments": {}}</response>'
+        )
+        result = parser.parse(response)
+
+        assert [call['name'] for call in result] == ['Bash', 'Read', 'Write']
+
     def test_parse_handles_empty_json_objects(self, parser):
         """Test parse() handles empty arguments"""
         response = '<tool_call>{"name": "Glob", "arguments": {}}</tool_call>'
@@ -386,6 +446,37 @@ class TestQwenEdgeCases:
         assert result is not None
         assert len(result[0]['arguments']['content']) == 50000
 
+    def test_parse_deduplicates_nested_arguments_by_value(self, parser):
+        """Test parse() drops repeats whose nested arguments differ only in key order"""
+        response = '''<tool_call>{"name": "Edit", "arguments": {"opts": {"a": 1, "b": [1, {"c": 2}]}}}</tool_call>
+        <tool_call>{"name": "Edit", "arguments": {"opts": {"b": [1, {"c": 2}], "a": 1}}}</tool_call>
+        <tool_call>{"name": "Edit", "arguments": {"opts": {"a": 1, "b": [{"c": 2}, 1]}}}</tool_call>'''
+        result = parser.parse(response)
+
+        # Key order is ignored, list order is not
+        assert len(result) == 2
+
+    def test_parse_keeps_calls_differing_only_in_scalar_type(self, parser):
+        """Test parse() doesn't treat 1, 1.0 and true as the same argument"""
+        response = '''<tool_call>{"name": "Set", "arguments": {"x": 1}}</tool_call>
+        <tool_call>{"name": "Set", "arguments": {"x": true}}</tool_call>
+        <tool_call>{"name": "Set", "arguments": {"x": 1.0}}</tool_call>
+        <tool_call>{"name": "Set", "arguments": {"x": [1]}}</tool_call>
+        <tool_call>{"name": "Set", "arguments": {"x": [true]}}</tool_call>'''
+        result = parser.parse(response)
+
+        assert [call['arguments']['x'] for call in result] == [1, True, 1.0, [1], [True]]
+        assert type(result[1]['arguments']['x']) is bool
+
+    def test_parse_ignores_loose_formats_inside_wrapped_call(self, parser):
+        """Test parse() doesn't report tag-like argument content as extra tool calls"""
+        response = '<tool_call>{"name": "Write", "arguments": {"content": "<Note text=\'hi\'/>"}}</tool_call>'
+        result = parser.parse(response)
+
+        assert len(result) == 1
+        assert result[0]['name'] == 'Write'
+        assert result[0]['arguments']['content'] == "<Note text='hi'/>"
+
 
 class TestQwenSecurityLimits:
     """Test security limits (size, timeout)"""
@@ -401,6 +492,17 @@ class TestQwenSecurityLimits:
         with pytest.raises(ToolParseError, match="exceeds limit"):
             parser.parse(response)
 
+    def test_parse_counts_multibyte_characters_in_size_limit(self):
+        """Test parse() measures the limit in UTF-8 bytes, not characters"""
+        parser = QwenToolParser(max_json_size_mb=1)
+
+        # 400K characters (under 1MB) that encode to 1.2MB (over 1MB)
+        content = '世' * 400_000
+        response = f'<tool_call>{{"name": "Write", "arguments": {{"content": "{content}"}}}}</tool_call>'
+
+        with pytest.raises(ToolParseError, match="exceeds limit"):
+            parser.parse(response)
+
     def test_parse_timeout_on_complex_parsing(self):
         """Test parse() enforces timeout limit"""
         parser = QwenToolParser(timeout_ms=1)  # 1ms timeout - very strict
@@ -420,6 +522,38 @@ class TestQwenSecurityLimits:
             # Timeout is expected on slower machines
             assert 'timeout' in str(e).lower()
 
+    def test_parse_adversarial_code_block_is_linear(self):
+        """Test unterminated code block with repeated headers doesn't backtrack"""
+        parser = QwenToolParser()
+        response = '```json\n' + '{"name": "a", "arguments": ' * 3000
+
+        start = time.perf_counter()
+        result = parser.parse(response)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        assert result is None or result == []
+        assert elapsed_ms < 100
+
+    def test_parse_unterminated_openings_are_linear(self):
+        """Test repeated openings without a matching close don't rescan the text"""
+        responses = [
+            '<tool_call>' * 5000,
+            '<tools>' * 5000 + '<tool_call>{}</tool_call>',
+            '<Read a' * 5000 + '/>',
+            'functools[' * 5000,
+            '<function name="a" arguments="' * 3000 + 'x/>',
+            '<function_call>' * 20000 + '<tool_call>{}</tool_call>',
+        ]
+
+        for response in responses:
+            parser = QwenToolParser(timeout_ms=10_000)
+            start = time.perf_counter()
+            result = parser.parse(response)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            assert result is None or result == []
+            assert elapsed_ms < 100, response[:20]
+
     def test_validate_json_size_method(self):
         """Test _validate_json_size() helper method"""
         parser = QwenToolParser(max_json_size_mb=1)
@@ -491,6 +625,68 @@ class TestQwenValidation:
         ]
         assert parser.validate(tool_calls) is True
 
+    def test_parse_rejects_non_dict_arguments(self, parser):
+        """Test parse() returns None when any parsed call has non-dict arguments"""
+        response = (
+            '<tool_call>{"name": "Read", "arguments": {}}</tool_call>\n'
+            '<tool_call>{"name": "Bash", "arguments": "ls"}</tool_call>'
+        )
+        assert parser.parse(response) is None
+
+
+class TestQwenParseCache:
+    """Test LRU caching of parse results"""
+
+    @pytest.fixture
+    def parser(self):
+        return QwenToolParser()
+
+    def test_repeated_parse_returns_equal_results(self, parser):
+        """Test cached parse returns the same tool calls"""
+        response = '<tool_call>{"name": "Read", "arguments": {"file_path": "/tmp/a"}}</tool_call>'
+        first = parser.parse(response)
+        second = parser.parse(response)
+
+        assert first == second
+        assert response in parser._parse_cache
+
+    def test_cached_result_is_isolated_from_caller_mutation(self, parser):
+        """Test mutating a returned result doesn't corrupt the cache"""
+        response = '<tool_call>{"name": "Read", "arguments": {"file_path": "/tmp/a"}}</tool_call>'
+        first = parser.parse(response)
+        first[0]['arguments']['file_path'] = '/etc/passwd'
+
+        second = parser.parse(response)
+        assert second[0]['arguments']['file_path'] == '/tmp/a'
+
+    def test_cache_is_bounded(self, parser):
+        """Test cache evicts least recently used entries"""
+        for i in range(parser.PARSE_CACHE_SIZE + 10):
+            parser.parse(f'<tool_call>{{"name": "Tool{i}", "arguments": {{}}}}</tool_call>')
+
+        assert len(parser._parse_cache) == parser.PARSE_CACHE_SIZE
+
+    def test_can_parse_uses_cached_result(self, parser):
+        """Test can_parse() agrees with a cached parse"""
+        parser.parse("Just plain text")
+        assert parser.can_parse("Just plain text") is False
+
+        response = '<tools>[{"name": "Read", "arguments": {}}]</tools>'
+        parser.parse(response)
+        assert parser.can_parse(response) is True
+
+    def test_plain_text_skips_cache(self, parser):
+        """Test responses without any format sentinel are rejected before caching"""
+        assert parser.parse("No tools needed here.") is None
+        assert "No tools needed here." not in parser._parse_cache
+
+    def test_code_without_format_tokens_skips_cache(self, parser):
+        """Test braces and comparisons alone don't count as a tool call format"""
+        response = "Use `d = {}` and check `if a < b:` before looping."
+        assert parser.can_parse(response) is False
+        assert parser.parse(response) is None
+        assert response not in parser._parse_cache
+
 
 class TestQwenThreadSafety:
     """Test thread safety for concurrent parsing"""
@@ -730,6 +926,31 @@ class TestQwenFormat6TagWithAttrs:
         assert result[0]['name'] == 'Bash'
         assert result[0]['arguments']['command'] == 'ls -la'
 
+    def test_parse_tag_with_attrs_value_with_angle_bracket(self, parser):
+        """Test parse() keeps '<' inside an attribute value"""
+        response = '<Bash command="sort < in.txt"/>'
+        result = parser.parse(response)
+
+        assert result is not None
+        assert result[0]['name'] == 'Bash'
+        assert result[0]['arguments']['command'] == 'sort < in.txt'
+
+    def test_parse_tag_with_attrs_non_ascii_name(self, parser):
+        """Test parse() keeps attributes whose names have non-ASCII letters"""
+        response = '<Write chemin_fichier="/tmp/a" naïve="oui"/>'
+        result = parser.parse(response)
+
+        assert result is not None
+        assert result[0]['arguments'] == {'chemin_fichier': '/tmp/a', 'naïve': 'oui'}
+
+    def test_parse_tag_with_attrs_paired_tags(self, parser):
+        """Test parse() accepts matching open/close tags and skips mismatched ones"""
+        response = '<Read file_path="/tmp/a"></Read>\n<Read file_path="/tmp/b"></Write>'
+        result = parser.parse(response)
+
+        assert result is not None
+        assert [call['arguments']['file_path'] for call in result] == ['/tmp/a']
+
 
 class TestQwenFormat8RawJsonBlock:
     """Test Format 8: ```json {...}``` (JSON in code block)"""
@@ -939,6 +1160,15 @@ class TestQwenFormat13GemmaFunctionCall:
         assert result[0]['name'] == 'web_search'
         assert result[0]['arguments']['query'] == 'python tutorial'
 
+    def test_parse_gemma_function_call_colon_in_value(self, parser):
+        """Test parse() keeps colons that aren't preceded by whitespace in the value"""
+        response = '<start_function_call>call:WebFetch{url:https://example.com/a prompt:summarize}<end_function_call>'
+        result = parser.parse(response)
+
+        assert result is not None
+        assert result[0]['arguments']['url'] == 'https://example.com/a'
+        assert result[0]['arguments']['prompt'] == 'summarize'
+
 
 class TestQwenIntegrationWithRegistry:
     """Test integration with ParserRegistry"""
@@ -17,12 +17,14 @@ import time
 import json
 import sys
 from pathlib import Path
+from unittest.mock import patch
 
 # Add scripts/lib to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "scripts"))
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "scripts" / "lib"))
 
 from schema_validator import SchemaValidator, ValidationResult, ValidationError
+from schema_validator import _run_with_timeout, _ValidationTimeout
 
 
 class TestBasicValidation(unittest.TestCase):
@@ -437,6 +439,132 @@ class TestEdgeCases(unittest.TestCase):
         self.assertFalse(result.is_valid)
         self.assertIn("size limit", result.error_message.lower())
 
+    def test_input_near_size_limit_accepted(self):
+        """Test inputs just under the size limit are measured exactly"""
+        schema = {"type": "object"}
+
+        # Worst-case estimate exceeds 10KB, serialized size does not
+        near_limit_input = {"data": "line\n" * 1500}
+
+        result = self.validator.validate_tool_call(
+            "Test",
+            near_limit_input,
+            schema
+        )
+
+        self.assertTrue(result.is_valid)
+
+    def test_size_limit_independent_of_orjson(self):
+        """Test the size limit gives the same verdict with and without orjson"""
+        import schema_validator
+        schema = {"type": "object"}
+        inputs = [
+            {"data": "\u00e9" * 3000},            # 6008 bytes compact UTF-8
+            {"data": "\u00e9" * 6000},            # 12008 bytes
+            {"items": ["x"] * 2000},               # fits only without ", " separators
+            {"data": "\x01" * 1500, "n": 1.5},    # escaped control characters
+        ]
+
+        verdicts = []
+        sizes = []
+        for orjson_module in (schema_validator.orjson, None):
+            with patch.object(schema_validator, "orjson", orjson_module):
+                validator = SchemaValidator(timeout_sec=5.0)
+                verdicts.append([validator.validate_tool_call("Test", args, schema).is_valid for args in inputs])
+                sizes.append([schema_validator._json_size(args) for args in inputs])
+
+        self.assertEqual(verdicts[0], verdicts[1])
+        self.assertEqual(verdicts[0], [True, False, True, True])
+        self.assertEqual(sizes[0], sizes[1])
+        for args, size in zip(inputs, sizes[0]):
+            self.assertGreaterEqual(schema_validator._estimate_json_size(args), size)
+
+    def test_schema_depth_limit(self):
+        """Test validation rejects overly nested schemas"""
+        schema = {"type": "string"}
+        for _ in range(12):
+            schema = {"type": "object", "properties": {"child": schema}}
+
+        with self.assertRaises(ValidationError) as context:
+            self.validator.register_tool_schema("Deep", schema)
+
+        self.assertIn("depth", str(context.exception).lower())
+
+    def test_annotations_ignored_but_properties_kept(self):
+        """Test annotation keywords are dropped without touching property names"""
+        schema = {
+            "type": "object",
+            "description": "Create a task",
+            "properties": {
+                "title": {"type": "string", "description": "Task title"},
+                "description": {"type": "string"}
+            },
+            "required": ["title", "description"]
+        }
+
+        valid = self.validator.validate_tool_call(
+            "Task", {"title": "a", "description": "b"}, schema
+        )
+        invalid = self.validator.validate_tool_call(
+            "Task", {"title": "a", "description": 1}, schema
+        )
+
+        self.assertTrue(valid.is_valid)
+        self.assertFalse(invalid.is_valid)
+        self.assertEqual(schema["description"], "Create a task")
+
+    def test_flat_schema_fast_path_defers_to_full_validation(self):
+        """Test flat schemas still reject values the fast path does not certify"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "file_path": {"type": "string"},
+                "limit": {"type": "integer"}
+            },
+            "required": ["file_path"]
+        }
+
+        valid = self.validator.validate_tool_call("Read", {"file_path": "/tmp/a", "limit": 5}, schema)
+        integral_float = self.validator.validate_tool_call("Read", {"file_path": "/tmp/a", "limit": 5.0}, schema)
+        boolean = self.validator.validate_tool_call("Read", {"file_path": "/tmp/a", "limit": True}, schema)
+
+        self.assertTrue(valid.is_valid)
+        self.assertTrue(integral_float.is_valid)
+        self.assertFalse(boolean.is_valid)
+        self.assertIn("limit", boolean.error_message)
+
+    def test_validation_result_slots_and_equality(self):
+        """Test ValidationResult has no instance __dict__ and compares by value"""
+        result = ValidationResult(is_valid=True, tool_name="Read")
+
+        self.assertFalse(hasattr(result, "__dict__"))
+        self.assertEqual(result, ValidationResult(is_valid=True, tool_name="Read"))
+        self.assertNotEqual(result, ValidationResult(is_valid=False, tool_name="Read"))
+        self.assertIn("tool_name='Read'", repr(result))
+
+    def test_preload_registers_all_tools(self):
+        """Test preload compiles every schema up front"""
+        schemas = {
+            "Read": {"type": "object", "required": ["file_path"]},
+            "Write": {"type": "object", "required": ["file_path", "content"]}
+        }
+
+        self.validator.preload(schemas)
+
+        self.assertEqual(set(self.validator.validators), {"Read", "Write"})
+
+    def test_identical_schemas_share_validator(self):
+        """Test tools with identical schemas reuse one compiled validator"""
+        self.validator.register_tool_schema("Read", {"type": "object", "required": ["file_path"]})
+        self.validator.register_tool_schema("Open", {"required": ["file_path"], "type": "object"})
+
+        self.assertIs(self.validator.validators["Read"], self.validator.validators["Open"])
+
+    def test_preload_rejects_invalid_schema(self):
+        """Test preload raises for an invalid schema"""
+        with self.assertRaises(ValidationError):
+            self.validator.preload({"Bad": {"type": "bogus"}})
+
     def test_schema_complexity_limit(self):
         """Test schema with too many properties is rejected"""
         # Create schema with > 100 properties
@@ -628,6 +756,210 @@ class TestErrorMessages(unittest.TestCase):
         self.assertIsNotNone(result.error_path)
         self.assertIn("config", result.error_path)
 
+    def test_collect_all_errors(self):
+        """Test collect_all_errors reports every error, first one as error_message"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "file_path": {"type": "string"},
+                "limit": {"type": "integer"}
+            },
+            "required": ["file_path"]
+        }
+
+        result = self.validator.validate_tool_call(
+            "Read",
+            {"limit": "ten"},
+            schema,
+            collect_all_errors=True
+        )
+
+        self.assertFalse(result.is_valid)
+        self.assertEqual(len(result.all_errors), 2)
+        self.assertEqual(result.error_message, result.all_errors[0])
+
+    def test_all_errors_omitted_by_default(self):
+        """Test validation stops at the first error by default"""
+        schema = {"type": "object", "required": ["file_path"]}
+
+        result = self.validator.validate_tool_call("Read", {}, schema)
+
+        self.assertFalse(result.is_valid)
+        self.assertIsNone(result.all_errors)
+
+    def test_error_path_includes_array_index(self):
+        """Test error path includes array index for invalid item"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "files": {"type": "array", "items": {"type": "string"}}
+            }
+        }
+
+        result = self.validator.validate_tool_call(
+            "Test",
+            {"files": ["a.txt", 42]},
+            schema
+        )
+
+        self.assertFalse(result.is_valid)
+        self.assertEqual(result.error_path, "$.files[1]")
+
+    def test_enum_error_lists_allowed_values(self):
+        """Test enum error message lists allowed values"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "mode": {"enum": ["read", "write"]}
+            }
+        }
+
+        result = self.validator.validate_tool_call("Test", {"mode": "delete"}, schema)
+
+        self.assertFalse(result.is_valid)
+        self.assertIn("mode", result.error_message)
+        self.assertIn("'write'", result.error_message)
+
+    def test_error_messages_independent_of_backend(self):
+        """Test fastjsonschema and the Draft7Validator fallback report the same errors"""
+        import schema_validator
+        schema = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "pattern": "^[a-z]+$"},
+                "mode": {"enum": ["read", "write"]}
+            }
+        }
+        calls = [
+            ("Test", {"name": "ABC"}, schema),
+            ("Test", {"mode": "delete"}, schema),
+            ("Bad", {}, {"type": None}),
+        ]
+
+        reports = []
+        for has_fast in (schema_validator.HAS_FASTJSONSCHEMA, False):
+            with patch.object(schema_validator, "HAS_FASTJSONSCHEMA", has_fast):
+                validator = SchemaValidator(timeout_sec=5.0)
+                reports.append([
+                    (result.is_valid, result.error_message, result.error_path)
+                    for result in (validator.validate_tool_call(*call) for call in calls)
+                ])
+
+        self.assertEqual(reports[0], reports[1])
+        self.assertTrue(all(not is_valid for is_valid, _, _ in reports[0]))
+
+    def test_defaults_not_applied_to_arguments(self):
+        """Test validation does not fill schema defaults into arguments"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 100}
+            }
+        }
+        arguments = {}
+
+        result = self.validator.validate_tool_call("Test", arguments, schema)
+
+        self.assertTrue(result.is_valid)
+        self.assertEqual(arguments, {})
+
+
+class TestTimeout(unittest.TestCase):
+    """Test validation time budget is enforced"""
+
+    def test_timeout_interrupts_main_thread(self):
+        """Test slow validation is interrupted on the main thread"""
+        start = time.perf_counter()
+        with self.assertRaises(_ValidationTimeout):
+            _run_with_timeout(lambda: time.sleep(2), 0.05)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_timeout_in_worker_thread(self):
+        """Test caller stops waiting when validating off the main thread"""
+        import threading
+        outcome = {}
+
+        def run():
+            start = time.perf_counter()
+            try:
+                _run_with_timeout(lambda: time.sleep(0.5), 0.05)
+            except _ValidationTimeout:
+                outcome['elapsed'] = time.perf_counter() - start
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertLess(outcome['elapsed'], 0.4)
+
+    def test_alarm_after_validation_goes_to_previous_handler(self):
+        """Test a SIGALRM outside a timed validation doesn't raise a timeout"""
+        import signal
+        if not hasattr(signal, 'setitimer'):
+            self.skipTest("SIGALRM timers not available")
+        received = []
+        original = signal.signal(signal.SIGALRM, lambda signum, frame: received.append(signum))
+        try:
+            self.assertEqual(_run_with_timeout(lambda: 42, 5.0), 42)
+            signal.setitimer(signal.ITIMER_REAL, 0.01)
+            time.sleep(0.2)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, original)
+        self.assertEqual(received, [signal.SIGALRM])
+
+    def test_saturated_pool_does_not_block_fast_schemas(self):
+        """Test validations off the main thread finish while every worker is busy"""
+        import threading
+        import schema_validator
+        release = threading.Event()
+        executor = schema_validator._get_executor()
+        busy = [executor.submit(release.wait, 5.0) for _ in range(executor._max_workers)]
+        outcome = {}
+
+        def run():
+            validator = SchemaValidator(timeout_sec=0.2)
+            start = time.perf_counter()
+            outcome['fast'] = validator.validate_tool_call(
+                "Read",
+                {"file_path": "/tmp/a", "limit": 5},
+                {"type": "object", "properties": {"file_path": {"type": "string"}, "limit": {"minimum": 1}}}
+            )
+            outcome['fast_elapsed'] = time.perf_counter() - start
+            start = time.perf_counter()
+            outcome['timed'] = validator.validate_tool_call(
+                "Grep", {"pattern": "a"}, {"properties": {"pattern": {"pattern": "^a$"}}}
+            )
+            outcome['timed_elapsed'] = time.perf_counter() - start
+
+        try:
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join(5.0)
+        finally:
+            release.set()
+            for future in busy:
+                future.result()
+
+        self.assertTrue(outcome['fast'].is_valid)
+        self.assertLess(outcome['fast_elapsed'], 0.1)
+        # A schema that needs the budget still returns once it runs out
+        self.assertFalse(outcome['timed'].is_valid)
+        self.assertIn("timeout", outcome['timed'].error_message.lower())
+        self.assertLess(outcome['timed_elapsed'], 1.0)
+
+    def test_only_slow_schemas_need_timeout(self):
+        """Test which schemas run under the time budget"""
+        from schema_validator import _needs_timeout
+        self.assertFalse(_needs_timeout({"type": "object", "properties": {"pattern": {"type": "string"}}}))
+        self.assertFalse(_needs_timeout({"anyOf": [{"type": "string"}, {"type": "integer"}]}))
+        self.assertTrue(_needs_timeout({"properties": {"q": {"type": "string", "pattern": "^a+$"}}}))
+        self.assertTrue(_needs_timeout({"items": {"uniqueItems": True}}))
+        self.assertTrue(_needs_timeout({"anyOf": [{"oneOf": [{"type": "string"}]}]}))
+
+    def test_result_returned_within_budget(self):
+        """Test fast calls return their value"""
+        self.assertEqual(_run_with_timeout(lambda: 42, 5.0), 42)
+
 
 class TestStatistics(unittest.TestCase):
     """Test validation statistics tracking"""
@@ -658,6 +990,19 @@ class TestStatistics(unittest.TestCase):
         self.assertEqual(stats['pass_rate'], 50.0)
         self.assertGreater(stats['avg_validation_time_ms'], 0)
 
+    def test_stats_disabled(self):
+        """Test validation skips timing and stats when disabled"""
+        validator = SchemaValidator(timeout_sec=5.0, enable_stats=False)
+        schema = {"type": "object", "required": ["file_path"]}
+
+        valid = validator.validate_tool_call("Read", {"file_path": "/tmp/test.txt"}, schema)
+        invalid = validator.validate_tool_call("Read", {}, schema)
+
+        self.assertTrue(valid.is_valid)
+        self.assertFalse(invalid.is_valid)
+        self.assertEqual(valid.validation_time_ms, 0.0)
+        self.assertEqual(validator.get_stats()['total_validations'], 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -65,6 +65,13 @@ except ImportError:
         pass
 
 
+def _mock_parser(parser_class):
+    """Mock parser without prefilter markers, so its can_parse() always decides"""
+    parser = Mock(spec=parser_class)
+    parser.prefilter_markers = ()
+    return parser
+
+
 class TestToolParserBase(unittest.TestCase):
     """Test ToolParserBase abstract base class"""
 
@@ -86,6 +93,17 @@ class TestToolParserBase(unittest.TestCase):
         # These will be used by concrete parsers
         self.assertTrue(hasattr(ToolParserBase, '__init__'))
 
+    def test_declared_prefilter_markers_stored_as_tuple(self):
+        """Test a subclass may declare one marker or a list of them"""
+        class SingleMarkerParser(ToolParserBase):
+            prefilter_markers = '<tool>'
+
+        class ListMarkerParser(ToolParserBase):
+            prefilter_markers = ['<a>', '<b>']
+
+        self.assertEqual(SingleMarkerParser.prefilter_markers, ('<tool>',))
+        self.assertEqual(ListMarkerParser.prefilter_markers, ('<a>', '<b>'))
+
 
 class TestOpenAIToolParser(unittest.TestCase):
     """Test OpenAI format tool parser"""
@@ -254,6 +272,36 @@ class TestOpenAIToolParser(unittest.TestCase):
         is_valid = self.parser.validate(invalid_calls)
         self.assertFalse(is_valid)
 
+    def test_can_parse_then_parse_decodes_once(self):
+        """Test parse() reuses the JSON decoded by can_parse()"""
+        from lib import tool_parsers
+
+        with patch.object(tool_parsers, '_loads', wraps=tool_parsers._loads) as loads:
+            self.assertTrue(self.parser.can_parse(self.valid_openai_json))
+            result = self.parser.parse(self.valid_openai_json)
+
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(result[0]['function']['name'], 'Read')
+
+    def test_text_without_tool_calls_key_is_not_decoded(self):
+        """Test strings lacking '"tool_calls"' are rejected before json decoding"""
+        from lib import tool_parsers
+
+        with patch.object(tool_parsers, '_loads', wraps=tool_parsers._loads) as loads:
+            self.assertFalse(self.parser.can_parse('{"content": "Hello"}'))
+            self.assertIsNone(self.parser.parse('{"content": "Hello"}'))
+
+        loads.assert_not_called()
+
+    def test_decode_matches_stdlib_json(self):
+        """Test inputs orjson rejects still decode like json.loads()"""
+        response = '{"tool_calls": [{"id": "call_1", "type": "function", ' \
+            '"function": {"name": "Read", "seed": 123456789012345678901234567890, "t": NaN}}]}'
+
+        self.assertTrue(self.parser.can_parse(response))
+        result = self.parser.parse(response)
+        self.assertEqual(result[0]['function']['seed'], 123456789012345678901234567890)
+
     def test_performance_parse_under_5ms(self):
         """Test parse() completes in <5ms per call"""
         iterations = 100
@@ -407,6 +455,29 @@ class TestCommentaryToolParser(unittest.TestCase):
         if result and 'context' in result[0]:
             self.assertIn('analyze the contents', result[0]['context'].lower())
 
+    def test_parse_context_is_per_tool_call(self):
+        """Test each tool call gets the commentary around its own block"""
+        response = (
+            'First I read.\n[TOOL_CALL]{"name": "Read", "arguments": {}}[/TOOL_CALL]\n'
+            'Then I write.\n[TOOL_CALL]{"name": "Write", "arguments": {}}[/TOOL_CALL]\nDone.'
+        )
+
+        result = self.parser.parse(response, preserve_context=True)
+
+        self.assertEqual(result[0]['context'], 'First I read. Then I write.')
+        self.assertEqual(result[1]['context'], 'Then I write. Done.')
+
+    def test_parse_pairs_each_open_tag_with_next_close_tag(self):
+        """Test block matching follows the non-greedy [TOOL_CALL]...[/TOOL_CALL] rules"""
+        response = (
+            '[TOOL_CALL]{"name": "Read"}[/TOOL_CALL] stray [/TOOL_CALL] '
+            '[TOOL_CALL]{"name": "Write"}[/TOOL_CALL] [TOOL_CALL]{"name": "Unclosed"}'
+        )
+
+        result = self.parser.parse(response)
+
+        self.assertEqual([call['name'] for call in result], ['Read', 'Write'])
+
     def test_performance_parse_under_10ms(self):
         """Test parse() completes in <10ms per call"""
         iterations = 100
@@ -461,7 +532,7 @@ class TestParserRegistry(unittest.TestCase):
     def test_register_maintains_priority_order(self):
         """Test adding parsers maintains priority ordering"""
         for i in range(10):
-            parser = Mock(spec=ToolParserBase)
+            parser = _mock_parser(ToolParserBase)
             # Register with random priorities
             priority = (i * 3) % 10
             self.registry.register(parser, priority=priority)
@@ -473,11 +544,11 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_parse_with_fallback_tries_openai_first(self):
         """Test parse_with_fallback() tries highest priority parser first"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = True
         openai_parser.parse.return_value = [{"name": "Read"}]
 
-        commentary_parser = Mock(spec=CommentaryToolParser)
+        commentary_parser = _mock_parser(CommentaryToolParser)
 
         self.registry.register(openai_parser, priority=10)
         self.registry.register(commentary_parser, priority=20)
@@ -492,10 +563,10 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_parse_with_fallback_falls_back_to_commentary(self):
         """Test parse_with_fallback() falls back when OpenAI parser fails"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = False
 
-        commentary_parser = Mock(spec=CommentaryToolParser)
+        commentary_parser = _mock_parser(CommentaryToolParser)
         commentary_parser.can_parse.return_value = True
         commentary_parser.parse.return_value = [{"name": "Read"}]
 
@@ -512,13 +583,13 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_parse_with_fallback_ultimately_falls_back_to_text(self):
         """Test parse_with_fallback() returns text response when all parsers fail"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = False
 
-        commentary_parser = Mock(spec=CommentaryToolParser)
+        commentary_parser = _mock_parser(CommentaryToolParser)
         commentary_parser.can_parse.return_value = False
 
-        fallback_parser = Mock(spec=FallbackParser)
+        fallback_parser = _mock_parser(FallbackParser)
         fallback_parser.can_parse.return_value = True
         fallback_parser.parse.return_value = {"type": "text", "content": "Just text"}
 
@@ -535,7 +606,7 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_metrics_tracking_success_counts(self):
         """Test registry tracks successful parses per parser"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = True
         openai_parser.parse.return_value = [{"name": "Read"}]
 
@@ -550,10 +621,10 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_metrics_tracking_fallback_counts(self):
         """Test registry tracks fallback chain usage"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = False
 
-        commentary_parser = Mock(spec=CommentaryToolParser)
+        commentary_parser = _mock_parser(CommentaryToolParser)
         commentary_parser.can_parse.return_value = True
         commentary_parser.parse.return_value = [{"name": "Read"}]
 
@@ -572,7 +643,7 @@ class TestParserRegistry(unittest.TestCase):
     def test_thread_safety_concurrent_registrations(self):
         """Test registry handles concurrent parser registrations safely"""
         def register_parser(priority):
-            parser = Mock(spec=ToolParserBase)
+            parser = _mock_parser(ToolParserBase)
             self.registry.register(parser, priority=priority)
 
         # Create 10 threads that register parsers concurrently
@@ -596,7 +667,7 @@ class TestParserRegistry(unittest.TestCase):
 
     def test_thread_safety_concurrent_parses(self):
         """Test registry handles concurrent parse requests safely"""
-        openai_parser = Mock(spec=OpenAIToolParser)
+        openai_parser = _mock_parser(OpenAIToolParser)
         openai_parser.can_parse.return_value = True
         openai_parser.parse.return_value = [{"name": "Read"}]
 
@@ -624,6 +695,92 @@ class TestParserRegistry(unittest.TestCase):
         for result in results:
             self.assertIsNotNone(result)
 
+    def test_metrics_exact_across_threads(self):
+        """Test metrics count every parse made from concurrent threads"""
+        parser = OpenAIToolParser()
+        self.registry.register(parser, priority=10)
+        response = json.dumps({"tool_calls": [
+            {"id": "call_1", "type": "function", "function": {"name": "Read"}}
+        ]})
+
+        def parse_many():
+            for _ in range(200):
+                self.registry.parse_with_fallback(response)
+
+        threads = [threading.Thread(target=parse_many) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        metrics = self.registry.get_metrics()
+        self.assertEqual(metrics['openai_attempts'], 1600)
+        self.assertEqual(metrics['openai_successes'], 1600)
+
+    def test_metrics_kept_after_threads_exit(self):
+        """Test counters of exited threads are folded in, not kept per thread"""
+        self.registry.register(FallbackParser(), priority=100)
+
+        for _ in range(20):
+            t = threading.Thread(target=self.registry.parse_with_fallback, args=("text",))
+            t.start()
+            t.join()
+        self.registry.parse_with_fallback("text")
+
+        metrics = self.registry.get_metrics()
+        self.assertEqual(metrics['fallback_attempts'], 21)
+        self.assertEqual(metrics['fallback_successes'], 21)
+        # Only the main thread is still alive
+        self.assertEqual(len(self.registry._all_counters), 1)
+
+    def test_parse_batch_matches_parse_with_fallback(self):
+        """Test parse_batch() returns per-response results in input order"""
+        self.registry.register(OpenAIToolParser(), priority=10)
+        self.registry.register(CommentaryToolParser(), priority=20)
+        self.registry.register(FallbackParser(), priority=100)
+
+        responses = [
+            json.dumps({"tool_calls": [
+                {"id": "call_1", "type": "function", "function": {"name": "Read"}}
+            ]}),
+            "Plain text",
+            "[TOOL_CALL]\n{\"name\": \"Write\"}\n[/TOOL_CALL]",
+            None,
+        ]
+        expected = [self.registry.parse_with_fallback(r) for r in responses]
+
+        self.assertEqual(self.registry.parse_batch(responses), expected)
+        self.assertEqual(self.registry.parse_batch([]), [])
+        metrics = self.registry.get_metrics()
+        self.assertEqual(metrics['openai_attempts'], 8)
+        self.assertEqual(metrics['commentary_successes'], 2)
+
+    def test_plain_text_skips_marker_parsers(self):
+        """Test parsers whose marker is absent are skipped without can_parse()"""
+        custom = CustomToolParser()
+        custom.register_pattern('qwen', r'<tool>(.*?)</tool>')
+        self.registry.register(OpenAIToolParser(), priority=10)
+        self.registry.register(CommentaryToolParser(), priority=20)
+        self.registry.register(custom, priority=30)
+        self.registry.register(FallbackParser(), priority=100)
+
+        with patch.object(OpenAIToolParser, 'can_parse') as openai_can_parse, \
+                patch.object(CommentaryToolParser, 'can_parse') as commentary_can_parse, \
+                patch.object(CustomToolParser, 'can_parse') as custom_can_parse:
+            result = self.registry.parse_with_fallback("Just some text response")
+
+        self.assertEqual(result, {"type": "text", "content": "Just some text response"})
+        openai_can_parse.assert_not_called()
+        commentary_can_parse.assert_not_called()
+        custom_can_parse.assert_not_called()
+        self.assertEqual(self.registry.get_metrics()['openai_attempts'], 1)
+
+        # Dicts bypass the prefilter
+        result = self.registry.parse_with_fallback({"tool_calls": [
+            {"id": "call_1", "type": "function", "function": {"name": "Read"}}
+        ]})
+        self.assertEqual(result[0]["function"]["name"], "Read")
+
 
 class TestCustomToolParser(unittest.TestCase):
     """Test custom tool parser for model-specific formats"""
@@ -662,6 +819,30 @@ class TestCustomToolParser(unittest.TestCase):
         parsers = registry.get_ordered_parsers()
         self.assertIsInstance(parsers[1], CustomToolParser)
 
+    def test_prefilter_markers_from_literal_prefixes(self):
+        """Test registered patterns expose their literal prefixes as markers"""
+        self.parser.register_pattern('qwen', r'<tool>(.*?)</tool>')
+        self.parser.register_pattern('phi', r'<\|tool_call\|>(.*?)<\|/tool_call\|>')
+        self.assertEqual(self.parser.prefilter_markers, ('<tool>', '<|tool_call|>'))
+
+        # A pattern with no literal prefix disables the prefilter
+        self.parser.register_pattern('bare', r'(\{.*?\})|<call>')
+        self.assertEqual(self.parser.prefilter_markers, ())
+
+    def test_absent_literal_prefix_skips_pattern(self):
+        """Test patterns whose literal prefix is absent are not searched"""
+        self.parser.register_pattern('qwen', r'<tool>(.*?)</tool>')
+        self.parser.register_pattern('phi', r'<\|tool_call\|>(.*?)<\|/tool_call\|>')
+
+        qwen_output = "<tool>{\"name\": \"Read\"}</tool>"
+        phi_pattern = Mock(wraps=self.parser.patterns['phi'])
+        self.parser.patterns['phi'] = phi_pattern
+        self.assertTrue(self.parser.can_parse(qwen_output))
+        self.assertEqual(self.parser.parse(qwen_output), [{"name": "Read"}])
+        self.assertFalse(self.parser.can_parse("no tags here"))
+        phi_pattern.search.assert_not_called()
+        phi_pattern.findall.assert_not_called()
+
 
 class TestFallbackParser(unittest.TestCase):
     """Test fallback parser for non-tool-call responses"""
@@ -683,6 +864,16 @@ class TestFallbackParser(unittest.TestCase):
         self.assertEqual(result['type'], 'text')
         self.assertEqual(result['content'], 'This is just a text response')
 
+    def test_parse_dict_without_serializing(self):
+        """Test force_str=False returns dict responses untouched"""
+        response = {"content": "Hello"}
+
+        self.assertEqual(self.parser.parse(response), {"type": "text", "content": '{"content": "Hello"}'})
+
+        result = self.parser.parse(response, force_str=False)
+        self.assertEqual(result["type"], "raw")
+        self.assertIs(result["content"], response)
+
     def test_fallback_has_lowest_priority(self):
         """Test fallback parser should have highest priority number (lowest priority)"""
         registry = ParserRegistry()